@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Optional
+from typing import Dict, Optional, Sequence, Union
+
+import numpy as np
 
 from app.models.co2 import CO2CalculationRequest, CO2CalculationResponse
 
@@ -41,6 +43,49 @@ class CO2CalculationService:
             co2_annual_t=None if co2_annual_t is None else round(co2_annual_t, 6),
         )
 
+    def calculate_batch(
+        self,
+        dbh_cm: Sequence[float],
+        height_m: Sequence[float],
+        wood_density_g_cm3: Union[float, Sequence[float]] = 0.6,
+        carbon_fraction: float = 0.47,
+        root_shoot_ratio: float = 0.24,
+    ) -> Dict[str, np.ndarray]:
+        """Vectorized ``calculate`` for many trees, without per-tree request models.
+
+        Returns one array per stock (``agb_t``, ``bgb_t``, ``total_biomass_t``,
+        ``carbon_t``, ``co2_stock_t``), unrounded and aligned with the inputs.
+        """
+        dbh = np.asarray(dbh_cm, dtype=float)
+        height = np.asarray(height_m, dtype=float)
+        density = np.asarray(wood_density_g_cm3, dtype=float)
+        if dbh.ndim != 1 or height.shape != dbh.shape:
+            raise ValueError("dbh_cm and height_m must be 1-D sequences of the same length")
+        if density.ndim != 0 and density.shape != dbh.shape:
+            raise ValueError("wood_density_g_cm3 must be a single value or one value per tree")
+        wood_density = np.broadcast_to(density, dbh.shape)
+        if (dbh <= 0).any() or (height <= 0).any() or (wood_density <= 0).any():
+            raise ValueError("dbh_cm, height_m and wood_density_g_cm3 must be > 0")
+        # Same bounds as CO2CalculationRequest enforces for a single tree
+        if not 0 < carbon_fraction < 1:
+            raise ValueError("carbon_fraction must be between 0 and 1 (exclusive)")
+        if root_shoot_ratio <= 0:
+            raise ValueError("root_shoot_ratio must be > 0")
+
+        agb_t = self._estimate_agb(dbh_cm=dbh, height_m=height, wood_density_g_cm3=wood_density)
+        bgb_t = root_shoot_ratio * agb_t
+        total_biomass_t = agb_t + bgb_t
+        carbon_t = total_biomass_t * carbon_fraction
+        co2_stock_t = carbon_t * (44.0 / 12.0)
+
+        return {
+            "agb_t": agb_t,
+            "bgb_t": bgb_t,
+            "total_biomass_t": total_biomass_t,
+            "carbon_t": carbon_t,
+            "co2_stock_t": co2_stock_t,
+        }
+
     def _estimate_agb(self, dbh_cm: float, height_m: float, wood_density_g_cm3: float) -> float:
         # Chave et al. (2014) generalized equation: AGB = a*(WD*DBH^2*H)^b
         # Convert kg to tonnes by dividing by 1000
@@ -3,7 +3,9 @@ from __future__ import annotations
 import math
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, Optional, Protocol, Tuple
+from typing import Dict, Optional, Protocol, Sequence, Tuple
+
+import numpy as np
 
 from pydantic import ValidationError
 
@@ -47,108 +49,155 @@ class EnvironmentalEstimationService:
     ) -> EnvironmentalEstimatesResponse:
         try:
             # Pydantic validation already enforced on request
-            normalized_inputs = self._normalize_inputs(request)
-
-            # 2) Volume
-            volume_dm3, volume_note = self._compute_volume_dm3(
-                diameter_cm=normalized_inputs["tree"]["diameter_cm"],
-                height_m=normalized_inputs["tree"].get("height_m"),
-                coeffs=normalized_inputs["coeffs"],
-            )
-
-            # 3) Biomass
-            biomass_kg = self._compute_biomass_kg(
-                diameter_cm=normalized_inputs["tree"]["diameter_cm"],
-                use_log_form=normalized_inputs["method"]["use_log_form"],
-                coeffs=normalized_inputs["coeffs"],
-            )
-
-            # 4) Carbon stock
-            carbon_stock_kg = biomass_kg * normalized_inputs["tree"]["carbon_fraction"]
-
-            # 5) RSR used
-            rsr_used = (
-                normalized_inputs["method"]["rsr_override"]
-                if normalized_inputs["method"]["rsr_override"] is not None
-                else 0.25
-            )
-
-            # 6) BEF (optional)
-            bef_value, bef_note = self._compute_bef(
-                mode=normalized_inputs["method"]["bef_mode"],
-                inputs=normalized_inputs,
-            )
-
-            # 7) Confidence & RD
-            confidence_method = "analytical"
-            confidence_notes = []
-            if volume_note:
-                confidence_notes.append(volume_note)
-            if bef_note:
-                confidence_notes.append(bef_note)
-
-            rd_value: Optional[float] = None
-            if normalized_inputs["feedback"]["observed_biomass_kg"] is not None:
-                observed = normalized_inputs["feedback"]["observed_biomass_kg"]  # type: ignore[assignment]
-                rd_value = abs(observed - biomass_kg) / observed if observed > 0 else None
-
-            # 8) Logging (no-op safe)
-            log_payload = {
-                "request_id": normalized_inputs["meta"]["request_id"],
-                "model_version": self._MODEL_VERSION,
-                "inputs_normalized": normalized_inputs,
-                "outputs": {
-                    "volume_dm3": round(volume_dm3, 6),
-                    "biomass_kg": round(biomass_kg, 6),
-                    "carbon_stock_kg": round(carbon_stock_kg, 6),
-                    "rsr_used": rsr_used,
-                    "bef": None if bef_value is None else round(bef_value, 6),
-                },
-                "rd": None if rd_value is None else round(rd_value, 6),
-                "timestamp": datetime.utcnow().isoformat(),
-            }
-            try:
-                logged, log_id = self._logger.log(log_payload)
-            except Exception:
-                logged, log_id = False, None
-
-            # 9) Response
-            response = EnvironmentalEstimatesResponse(
-                request_id=normalized_inputs["meta"]["request_id"],
-                model_version=self._MODEL_VERSION,
-                inputs=normalized_inputs,
-                results={
-                    "volume_dm3": round(volume_dm3, 6),
-                    "biomass_kg": round(biomass_kg, 6),
-                    "carbon_stock_kg": round(carbon_stock_kg, 6),
-                    "rsr_used": rsr_used,
-                    "bef": None if bef_value is None else round(bef_value, 6),
-                    "confidence": {
-                        "method": confidence_method,
-                        "notes": "; ".join(confidence_notes) if confidence_notes else "",
-                        "relative_error_rd": None if rd_value is None else round(rd_value, 6),
-                    },
-                },
-                citations=[
-                    {
-                        "source": "Cutini et al., 2013",
-                        "equations": [
-                            "V=0.039*D^2*H",
-                            "Y=a*D^b",
-                            "ln(Y)=ln(a)+b*ln(D)",
-                        ],
-                    }
-                ],
-                logging={"logged": bool(logged), "log_id": log_id},
-            )
-            return response
+            normalized_inputs = self.normalize_inputs(request)
+            results = self.compute_results(normalized_inputs)
+            return self.build_response(normalized_inputs, results)
         except ValidationError:
             # Propagate; FastAPI/request layer should control mapping to error responses
             raise
         except Exception as exc:
             raise exc
 
-    def _normalize_inputs(self, request: EnvironmentalEstimatesRequest) -> Dict[str, object]:
+    def compute_results(self, normalized_inputs: Dict[str, object]) -> Dict[str, object]:
+        """The ``results`` block for normalized inputs: a pure function of the tree,
+        method, coefficients and feedback (``meta`` is not read)."""
+        # 2) Volume
+        volume_dm3, volume_note = self._compute_volume_dm3(
+            diameter_cm=normalized_inputs["tree"]["diameter_cm"],
+            height_m=normalized_inputs["tree"].get("height_m"),
+            coeffs=normalized_inputs["coeffs"],
+        )
+
+        # 3) Biomass
+        biomass_kg = self._compute_biomass_kg(
+            diameter_cm=normalized_inputs["tree"]["diameter_cm"],
+            use_log_form=normalized_inputs["method"]["use_log_form"],
+            coeffs=normalized_inputs["coeffs"],
+        )
+
+        # 4) Carbon stock
+        carbon_stock_kg = biomass_kg * normalized_inputs["tree"]["carbon_fraction"]
+
+        # 5) RSR used
+        rsr_used = (
+            normalized_inputs["method"]["rsr_override"]
+            if normalized_inputs["method"]["rsr_override"] is not None
+            else 0.25
+        )
+
+        # 6) BEF (optional)
+        bef_value, bef_note = self._compute_bef(
+            mode=normalized_inputs["method"]["bef_mode"],
+            inputs=normalized_inputs,
+        )
+
+        # 7) Confidence & RD
+        confidence_method = "analytical"
+        confidence_notes = []
+        if volume_note:
+            confidence_notes.append(volume_note)
+        if bef_note:
+            confidence_notes.append(bef_note)
+
+        rd_value: Optional[float] = None
+        if normalized_inputs["feedback"]["observed_biomass_kg"] is not None:
+            observed = normalized_inputs["feedback"]["observed_biomass_kg"]  # type: ignore[assignment]
+            rd_value = abs(observed - biomass_kg) / observed if observed > 0 else None
+
+        return {
+            "volume_dm3": round(volume_dm3, 6),
+            "biomass_kg": round(biomass_kg, 6),
+            "carbon_stock_kg": round(carbon_stock_kg, 6),
+            "rsr_used": rsr_used,
+            "bef": None if bef_value is None else round(bef_value, 6),
+            "confidence": {
+                "method": confidence_method,
+                "notes": "; ".join(confidence_notes) if confidence_notes else "",
+                "relative_error_rd": None if rd_value is None else round(rd_value, 6),
+            },
+        }
+
+    def build_response(
+        self, normalized_inputs: Dict[str, object], results: Dict[str, object]
+    ) -> EnvironmentalEstimatesResponse:
+        """Log one estimate and wrap it in a response; runs on every request."""
+        # 8) Logging (no-op safe)
+        log_payload = {
+            "request_id": normalized_inputs["meta"]["request_id"],
+            "model_version": self._MODEL_VERSION,
+            "inputs_normalized": normalized_inputs,
+            "outputs": {
+                key: results[key]
+                for key in ("volume_dm3", "biomass_kg", "carbon_stock_kg", "rsr_used", "bef")
+            },
+            "rd": results["confidence"]["relative_error_rd"],
+            "timestamp": datetime.utcnow().isoformat(),
+        }
+        try:
+            logged, log_id = self._logger.log(log_payload)
+        except Exception:
+            logged, log_id = False, None
+
+        # 9) Response
+        return EnvironmentalEstimatesResponse(
+            request_id=normalized_inputs["meta"]["request_id"],
+            model_version=self._MODEL_VERSION,
+            inputs=normalized_inputs,
+            results=results,
+            citations=[
+                {
+                    "source": "Cutini et al., 2013",
+                    "equations": [
+                        "V=0.039*D^2*H",
+                        "Y=a*D^b",
+                        "ln(Y)=ln(a)+b*ln(D)",
+                    ],
+                }
+            ],
+            logging={"logged": bool(logged), "log_id": log_id},
+        )
+
+    def compute_batch(
+        self,
+        diameter_cm: Sequence[float],
+        height_m: Optional[Sequence[Optional[float]]] = None,
+        carbon_fraction: float = 0.47,
+        coeffs: Optional[CoefficientsInput] = None,
+    ) -> Dict[str, np.ndarray]:
+        """Vectorized volume/biomass/carbon for many trees, without per-tree request models.
+
+        Trees with a missing or zero height use the D-only volume model, as in
+        ``computeEnvironmentalEstimates``. Returns ``volume_dm3``, ``biomass_kg``
+        and ``carbon_stock_kg`` arrays, unrounded and aligned with the inputs.
+        """
+        coeffs = coeffs or CoefficientsInput()
+        diameter = np.asarray(diameter_cm, dtype=float)
+        if height_m is None:
+            height = np.full(diameter.shape, np.nan)
+        else:
+            height = np.array([np.nan if h is None else h for h in height_m], dtype=float)
+        if diameter.ndim != 1 or height.shape != diameter.shape:
+            raise ValueError("diameter_cm and height_m must be 1-D sequences of the same length")
+        if (diameter <= 0).any() or (height < 0).any():
+            raise ValueError("diameter_cm must be > 0 and height_m must be >= 0")
+        if not 0 < carbon_fraction <= 1:
+            raise ValueError("carbon_fraction must be in (0, 1]")
+
+        diameter_sq = diameter ** 2
+        has_height = height > 0  # NaN compares False
+        volume_dm3 = np.where(
+            has_height,
+            coeffs.volume_with_h_coef * diameter_sq * np.nan_to_num(height),
+            coeffs.volume_without_h_coef * diameter_sq,
+        )
+        biomass_kg = coeffs.biomass_a * diameter ** coeffs.biomass_b
+        return {
+            "volume_dm3": volume_dm3,
+            "biomass_kg": biomass_kg,
+            "carbon_stock_kg": biomass_kg * carbon_fraction,
+        }
+
+    def normalize_inputs(self, request: EnvironmentalEstimatesRequest) -> Dict[str, object]:
         # Defaults
         carbon_fraction = request.tree.carbon_fraction if request.tree.carbon_fraction is not None else 0.47
         coeffs: CoefficientsInput = request.coeffs or CoefficientsInput()
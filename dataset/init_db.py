@@ -48,6 +48,14 @@ def init_database(sql_file: Path, db_file: Path) -> None:
         count = cursor.fetchone()[0]
         print(f"✅ {count:,} righe inserite nella tabella 'baumkatogd'")
         
+        # Colonna derivata DBH (cm): calcolata da SQLite e indicizzabile,
+        # così le query non ripetono la divisione per ogni riga
+        print("\n📐 Aggiunta colonna derivata 'dbh_cm'...")
+        cursor.execute(
+            "ALTER TABLE baumkatogd ADD COLUMN dbh_cm REAL "
+            "GENERATED ALWAYS AS (trunk_circumference / 3.141592653589793) VIRTUAL"
+        )
+        
         # Crea indici per performance
         print("\n🔍 Creazione indici per ottimizzare le query...")
         
@@ -57,13 +65,51 @@ def init_database(sql_file: Path, db_file: Path) -> None:
             ("idx_plant_year", "plant_year"),
             ("idx_tree_id", "tree_id"),
             ("idx_area_group", "area_group"),
+            ("idx_object_street", "object_street"),
+            ("idx_dbh_cm", "dbh_cm"),
+            ("idx_trunk_circumference", "trunk_circumference"),
+            ("idx_district_species", "district, genus_species"),
+            # Indice coprente per conteggi, età e DBH medi per distretto:
+            # le aggregazioni leggono solo l'indice, senza accedere alla tabella
+            ("idx_district_year_circ", "district, plant_year, trunk_circumference"),
         ]
         
         for idx_name, column in indices:
             print(f"  - Creazione indice su '{column}'...")
             cursor.execute(f"CREATE INDEX IF NOT EXISTS {idx_name} ON baumkatogd({column})")
         
+        # Indice full-text su specie e via: le ricerche testuali usano MATCH
+        # invece di LIKE '%...%' (dataset statico, niente trigger di sync)
+        print("  - Creazione indice full-text su 'genus_species', 'object_street'...")
+        cursor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS baumkatogd_fts "
+            "USING fts5(genus_species, object_street, content='baumkatogd')"
+        )
+        cursor.execute("INSERT INTO baumkatogd_fts(baumkatogd_fts) VALUES('rebuild')")
+        
+        # Tabelle riassuntive per distretto e per specie: il dataset è statico,
+        # quindi le aggregazioni sull'intera tabella si calcolano una volta sola.
+        # L'età media si ricava a query time da avg_plant_year (cambia ogni anno)
+        print("  - Creazione tabelle riassuntive per distretto e specie...")
+        cursor.execute(
+            "CREATE TABLE baumkatogd_by_district AS "
+            "SELECT district, COUNT(*) AS tree_count, "
+            "AVG(CASE WHEN trunk_circumference > 0 THEN dbh_cm END) AS avg_dbh_cm, "
+            "AVG(CASE WHEN plant_year > 0 THEN plant_year END) AS avg_plant_year "
+            "FROM baumkatogd WHERE district IS NOT NULL GROUP BY district"
+        )
+        cursor.execute(
+            "CREATE TABLE baumkatogd_by_species AS "
+            "SELECT genus_species, COUNT(*) AS tree_count, "
+            "AVG(CASE WHEN trunk_circumference > 0 THEN dbh_cm END) AS avg_dbh_cm "
+            "FROM baumkatogd WHERE genus_species IS NOT NULL GROUP BY genus_species"
+        )
+        
+        # Statistiche per il query planner, così sceglie gli indici nei GROUP BY
+        cursor.execute("ANALYZE")
         conn.commit()
+        # Compatta le pagine dopo il caricamento (fuori da ogni transazione)
+        cursor.execute("VACUUM")
         print("✅ Indici creati con successo")
         
         # Statistiche database
@@ -2,21 +2,22 @@ from __future__ import annotations
 
 import json
 import os
-from typing import Annotated, List, Literal, Optional, Sequence, TypedDict
+from typing import Annotated, Iterable, List, Literal, Optional, Sequence, TypedDict
 import re
 from decimal import Decimal, InvalidOperation
+from pathlib import Path
 
 from dotenv import load_dotenv
-from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, SystemMessage
 from langchain_openai import ChatOpenAI
 from langgraph.graph import END, StateGraph
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode
 
 from streamlit_app.tools.chart_tool import ChartGenerationTool
-from streamlit_app.tools.co2_tool import CO2CalculationTool
+from streamlit_app.tools.co2_tool import CO2BatchCalculationTool, CO2CalculationTool
 from streamlit_app.tools.dataset_tool import DatasetQueryTool
-from streamlit_app.tools.environment_tool import EnvironmentEstimationTool
+from streamlit_app.tools.environment_tool import EnvironmentBatchEstimationTool, EnvironmentEstimationTool
 
 # Load environment variables
 load_dotenv()
@@ -56,12 +57,25 @@ class TreeEvaluatorAgent:
             temperature=1,  # Lower temperature for higher determinism and exact phrasing
             api_key=api_key,
         )
+        # Cheaper model tried first for text-to-SQL; the tool escalates to the base LLM
+        # when the generated query does not compile
+        self._fast_llm = ChatOpenAI(
+            model="gpt-5-mini",
+            temperature=1,
+            api_key=api_key,
+        )
 
         # Initialize tools with LLM
         self._tools = [
             CO2CalculationTool(),
+            CO2BatchCalculationTool(),
             EnvironmentEstimationTool(),
-            DatasetQueryTool(llm=self._base_llm),
+            EnvironmentBatchEstimationTool(),
+            DatasetQueryTool(
+                llm=self._base_llm,
+                fast_llm=self._fast_llm,
+                sql_cache_path=Path(os.getenv("SQL_CACHE_PATH", "data/nl2sql_cache.db")),
+            ),
             ChartGenerationTool(llm=self._base_llm),
         ]
 
@@ -418,8 +432,8 @@ Task da completare:
             system_msg = SystemMessage(
                 content="""You are a helpful tree evaluation assistant with access to:
 
-1. **CO2 Calculation Tool**: Calculate CO2 sequestration and biomass for individual trees given their measurements.
-2. **Environmental Estimation Tool**: Compute volume, biomass, and carbon stock using alternative formulas.
+1. **CO2 Calculation Tool**: Calculate CO2 sequestration and biomass for individual trees given their measurements (use the batch variant for several trees at once).
+2. **Environmental Estimation Tool**: Compute volume, biomass, and carbon stock using alternative formulas (use the batch variant for several trees at once).
 3. **Dataset Query Tool**: Query a real Vienna trees dataset (BAUMKATOGD) with filtering, aggregation, and statistics.
 4. **Chart Generation Tool**: Create interactive visualizations (bar, pie, line, scatter, histogram, box plots) from the dataset.
 
@@ -599,12 +613,12 @@ Per favore, completa la risposta affrontando i task mancanti."""
         else:
             return "retry"
 
-    def chat(self, message: str, history: Optional[List[dict]] = None) -> str:
+    def chat(self, message: str, history: Optional[Iterable[dict]] = None) -> str:
         """Chat with the agent.
 
         Args:
             message: User message
-            history: Optional chat history as list of dicts with 'role' and 'content' keys
+            history: Optional chat history as an iterable of dicts with 'role' and 'content' keys
 
         Returns:
             Agent response as string
@@ -631,7 +645,7 @@ Per favore, completa la risposta affrontando i task mancanti."""
 
         return str(final_message.content)
 
-    def stream_chat(self, message: str, history: Optional[List[dict]] = None):
+    def stream_chat(self, message: str, history: Optional[Iterable[dict]] = None):
         """Stream chat response with LangGraph streaming, including reasoning steps.
 
         Args:
@@ -640,7 +654,8 @@ Per favore, completa la risposta affrontando i task mancanti."""
 
         Yields:
             Dict with 'type' and 'content' keys:
-            - type: 'reasoning' (internal step) or 'response' (final answer)
+            - type: 'reasoning' (internal step), 'draft' (answer text generated
+              so far by the agent model, token by token) or 'response' (final answer)
             - content: the actual content to display
         """
         # Convert history to messages
@@ -661,8 +676,30 @@ Per favore, completa la risposta affrontando i task mancanti."""
         max_retries = 2
         chart_data_json = None  # Track chart data if generated
 
-        # Stream from graph with updates mode to see each node
-        for event in self._graph.stream({"messages": messages}, stream_mode="updates"):
+        # Draft answer of the agent model currently streaming (reset on each new call)
+        draft_id = None
+        draft_text = ""
+
+        # Stream from graph with updates mode to see each node, and messages mode
+        # to forward the agent's answer tokens as they are generated
+        for stream_mode, event in self._graph.stream(
+            {"messages": messages}, stream_mode=["updates", "messages"]
+        ):
+            if stream_mode == "messages":
+                chunk, metadata = event
+                if (
+                    metadata.get("langgraph_node") == "agent"
+                    and isinstance(chunk, AIMessageChunk)
+                    and isinstance(chunk.content, str)
+                    and chunk.content
+                    and not chunk.tool_call_chunks
+                ):
+                    if chunk.id != draft_id:
+                        draft_id, draft_text = chunk.id, ""
+                    draft_text += chunk.content
+                    yield {"type": "draft", "content": draft_text}
+                continue
+
             # event is a dict with node_name: node_output
             for node_name, node_output in event.items():
                 
@@ -749,9 +786,9 @@ Per favore, completa la risposta affrontando i task mancanti."""
                                     else:
                                         result_data = msg.content
                                     
-                                    # Check if this is chart data (chart tool returns "chart_json" key)
-                                    if "chart_json" in result_data and result_data.get("success"):
-                                        chart_data_json = json.dumps(result_data, ensure_ascii=False, indent=2)
+                                    # Check if this is chart data (chart tool returns "chart" key)
+                                    if "chart" in result_data and result_data.get("success"):
+                                        chart_data_json = json.dumps(result_data, ensure_ascii=False)
                                         print(f"[DEBUG] Chart data captured! Length: {len(chart_data_json)} chars")
                                     
                                     reasoning = f"✅ **Risultati Tool**\n\n"
@@ -3,17 +3,25 @@ from __future__ import annotations
 import os
 from pathlib import Path
 
+import streamlit as st
+
 from streamlit_app.repository import ChatRepository
 from streamlit_app.service import ChatService
 from streamlit_app.ui import ChatUI
 
 
 def main() -> None:
-    db_path_str = os.getenv("CHAT_DB_PATH", "data/chat_index.db")
-    db_path = Path(db_path_str)
-    repository = ChatRepository(db_path=db_path)
-    service = ChatService(repository=repository)
-    ui = ChatUI(service=service)
+    # Must be the first Streamlit command of the script run
+    st.set_page_config(page_title="Tree Evaluator Chat", page_icon="🌳", layout="centered")
+
+    # One service per browser session: reruns reuse its repository and its
+    # lazily built agent instead of recreating them on every interaction
+    if "chat_service" not in st.session_state:
+        db_path_str = os.getenv("CHAT_DB_PATH", "data/chat_index.db")
+        db_path = Path(db_path_str)
+        repository = ChatRepository(db_path=db_path)
+        st.session_state.chat_service = ChatService(repository=repository)
+    ui = ChatUI(service=st.session_state.chat_service)
     ui.render()
 
 
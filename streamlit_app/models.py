@@ -7,6 +7,10 @@ from typing import Literal, Optional
 
 Role = Literal["user", "assistant"]
 
+# Roles are persisted as small integers to keep message rows compact
+_ROLE_TO_INT = {"user": 0, "assistant": 1}
+_INT_TO_ROLE = {v: k for k, v in _ROLE_TO_INT.items()}
+
 
 @dataclass
 class Conversation:
@@ -70,12 +74,12 @@ class ChatMessage:
             created_at=created_at,
         )
 
-    def to_persistence_tuple(self) -> tuple[str, int, str, str, str]:
+    def to_persistence_tuple(self) -> tuple[str, int, int, str, str]:
         """Return tuple for INSERT: (user_id, conversation_id, role, content, created_at)."""
         return (
             self.user_id,
             self.conversation_id,
-            self.role,
+            _ROLE_TO_INT[self.role],
             self.content,
             self.created_at.isoformat(),
         )
@@ -86,7 +90,7 @@ class ChatMessage:
         return ChatMessage(
             user_id=row["user_id"],
             conversation_id=row["conversation_id"],
-            role=row["role"],
+            role=_INT_TO_ROLE[row["role"]],
             content=row["content"],
             created_at=created_at,
         )
@@ -1,10 +1,24 @@
 from __future__ import annotations
 
+import atexit
 import sqlite3
+import threading
+import weakref
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional
 
-from streamlit_app.models import ChatMessage, Conversation
+from streamlit_app.models import _INT_TO_ROLE, ChatMessage, Conversation
+
+
+# Live repositories (one per Streamlit session), held weakly so sessions can be collected
+_LIVE_REPOSITORIES: "weakref.WeakSet[ChatRepository]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_at_exit() -> None:
+    """Persist the timestamps still pending in live repositories when the process stops."""
+    for repository in list(_LIVE_REPOSITORIES):
+        repository.flush()
 
 
 class ChatRepository:
@@ -17,7 +31,12 @@ class ChatRepository:
     def __init__(self, db_path: Path) -> None:
         self._db_path = Path(db_path)
         self._db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Conversations touched by add_message, waiting for flush(): id -> updated_at
+        self._dirty_convs: Dict[int, str] = {}
+        # flush() also runs from the exit hook, on another thread than add_message
+        self._dirty_lock = threading.Lock()
         self._ensure_schema()
+        _LIVE_REPOSITORIES.add(self)
 
     def _connect(self) -> sqlite3.Connection:
         connection = sqlite3.connect(self._db_path.as_posix())
@@ -35,6 +54,11 @@ class ChatRepository:
                 # Drop old schema
                 connection.execute("DROP TABLE IF EXISTS messages")
                 connection.execute("DROP INDEX IF EXISTS idx_messages_user_time")
+                result = None
+            # Old schema stored role as TEXT: keep the rows aside and convert them below
+            migrate_roles = bool(result and 'role TEXT' in result[0])
+            if migrate_roles:
+                connection.execute("ALTER TABLE messages RENAME TO messages_legacy")
             
             # Create conversations table
             connection.execute(
@@ -62,13 +86,24 @@ class ChatRepository:
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     user_id TEXT NOT NULL,
                     conversation_id INTEGER NOT NULL,
-                    role TEXT NOT NULL CHECK(role IN ('user', 'assistant')),
+                    role INTEGER NOT NULL CHECK(role IN (0, 1)),
                     content TEXT NOT NULL,
                     created_at TEXT NOT NULL,
                     FOREIGN KEY (conversation_id) REFERENCES conversations(id) ON DELETE CASCADE
                 );
                 """
             )
+            if migrate_roles:
+                connection.execute(
+                    """
+                    INSERT INTO messages (id, user_id, conversation_id, role, content, created_at)
+                    SELECT id, user_id, conversation_id,
+                           CASE role WHEN 'user' THEN 0 ELSE 1 END,
+                           content, created_at
+                    FROM messages_legacy
+                    """
+                )
+                connection.execute("DROP TABLE messages_legacy")
             connection.execute(
                 """
                 CREATE INDEX IF NOT EXISTS idx_messages_conversation
@@ -167,7 +202,11 @@ class ChatRepository:
     # Message methods
     
     def add_message(self, message: ChatMessage) -> int:
-        """Add a message to a conversation."""
+        """Add a message to a conversation.
+
+        The conversation's ``updated_at`` is not written here: it is recorded
+        as dirty and persisted by the next ``flush()``.
+        """
         from datetime import datetime, timezone
         with self._connect() as connection:
             cursor = connection.execute(
@@ -178,16 +217,35 @@ class ChatRepository:
                 message.to_persistence_tuple(),
             )
             message_id = int(cursor.lastrowid)
-            # Update conversation timestamp in the same transaction
+        with self._dirty_lock:
+            self._dirty_convs[message.conversation_id] = datetime.now(tz=timezone.utc).isoformat()
+        return message_id
+
+    def flush(self) -> int:
+        """Persist pending conversation timestamps with a single UPDATE.
+
+        Returns the number of conversations whose timestamp was written.
+        """
+        with self._dirty_lock:
+            pending, self._dirty_convs = self._dirty_convs, {}
+        if not pending:
+            return 0
+        cases = " ".join("WHEN ? THEN ?" for _ in pending)
+        placeholders = ", ".join("?" for _ in pending)
+        params: List[object] = []
+        for conversation_id, updated_at in pending.items():
+            params.extend((conversation_id, updated_at))
+        params.extend(pending.keys())
+        with self._connect() as connection:
             connection.execute(
-                """
+                f"""
                 UPDATE conversations
-                SET updated_at = ?
-                WHERE id = ?
+                SET updated_at = CASE id {cases} END
+                WHERE id IN ({placeholders})
                 """,
-                (datetime.now(tz=timezone.utc).isoformat(), message.conversation_id),
+                params,
             )
-            return message_id
+        return len(pending)
 
     def list_messages_by_conversation(self, conversation_id: int) -> List[ChatMessage]:
         """List all messages in a conversation, ordered chronologically."""
@@ -204,6 +262,30 @@ class ChatRepository:
             rows: Iterable[sqlite3.Row] = cursor.fetchall()
             return [ChatMessage.from_persistence_row(dict(r)) for r in rows]
 
+    def iter_role_content_by_conversation(self, conversation_id: int) -> Iterator[dict]:
+        """Lazily yield ``{"role", "content"}`` dicts for a conversation, as consumed by the agent.
+
+        Rows are fetched in blocks of ``arraysize``, so building the agent's
+        prompt never holds the whole history as an intermediate list.
+        """
+        connection = self._connect()
+        connection.row_factory = lambda _cursor, row: {"role": _INT_TO_ROLE[row[0]], "content": row[1]}
+        try:
+            cursor = connection.execute(
+                """
+                SELECT role, content
+                FROM messages
+                WHERE conversation_id = ?
+                ORDER BY datetime(created_at) ASC
+                """,
+                (conversation_id,),
+            )
+            cursor.arraysize = 64
+            while rows := cursor.fetchmany():
+                yield from rows
+        finally:
+            connection.close()
+
     # User settings methods
     
     def save_user_settings(self, user_id: str, openai_api_key: str) -> None:
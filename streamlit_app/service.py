@@ -1,18 +1,28 @@
 from __future__ import annotations
 
 from datetime import datetime
+from functools import partial
 from typing import List, Optional, Tuple
 
 from streamlit_app.models import ChatMessage, Conversation
 from streamlit_app.repository import ChatRepository
 
 
+def _echo_prefix() -> str:
+    """Return the 'Echo (HH:MM:SS): ' prefix used by demo/fallback replies."""
+    return f"Echo ({datetime.utcnow().strftime('%H:%M:%S')}): "
+
+
 class ChatService:
     """Application service orchestrating chat interactions and persistence."""
 
     def __init__(self, repository: ChatRepository, agent=None) -> None:
         self._repository = repository
         self._agent = agent  # LangGraph agent (optional, lazy-loaded)
+        self._agent_key: Optional[str] = None  # API key the lazy-loaded agent was built with
+        # Message constructors pre-bound to their role
+        self._new_user_message = partial(ChatMessage.new, role="user")
+        self._new_assistant_message = partial(ChatMessage.new, role="assistant")
 
     # Conversation management
     
@@ -44,6 +54,10 @@ class ChatService:
         """Delete a conversation and all its messages."""
         return self._repository.delete_conversation(conversation_id)
 
+    def flush(self) -> int:
+        """Persist pending conversation timestamp updates; returns how many were written."""
+        return self._repository.flush()
+
     # User settings management
     
     def save_user_api_key(self, user_id: str, api_key: str) -> None:
@@ -63,7 +77,7 @@ class ChatService:
 
     def add_user_message(self, user_id: str, conversation_id: int, content: str) -> ChatMessage:
         """Add a user message to a conversation."""
-        message = ChatMessage.new(user_id=user_id, conversation_id=conversation_id, role="user", content=content)
+        message = self._new_user_message(user_id=user_id, conversation_id=conversation_id, content=content)
         self._repository.add_message(message)
         return message
 
@@ -73,8 +87,8 @@ class ChatService:
         if not openai_api_key:
             return None
             
-        # Se agent già esiste, ritorna quello esistente
-        if self._agent is not None:
+        # Se agent già esiste (per questa chiave), ritorna quello esistente
+        if self._agent is not None and self._agent_key in (None, openai_api_key):
             return self._agent
             
         # Crea nuovo agent
@@ -84,6 +98,7 @@ class ChatService:
             
             # Inizializza agent senza mostrare messaggi ripetitivi
             self._agent = TreeEvaluatorAgent(openai_api_key=openai_api_key)
+            self._agent_key = openai_api_key
             return self._agent
             
         except ImportError as e:
@@ -111,33 +126,26 @@ class ChatService:
         
         if agent is not None:
             try:
-                # Get conversation history for context
-                history = self.get_conversation_messages(conversation_id)
-                # Convert to format expected by agent (exclude current message)
-                history_dicts = [
-                    {"role": msg.role, "content": msg.content}
-                    for msg in history
-                ]
+                # Conversation history, already in the agent's format, streamed from SQLite
+                history_dicts = self._repository.iter_role_content_by_conversation(conversation_id)
                 
                 # Get agent response
                 reply_text = agent.chat(last_user_message, history=history_dicts)
             except Exception as e:
                 # Fallback to demo response if agent fails
                 print(f"Warning: Agent failed, using fallback: {e}")
-                timestamp = datetime.utcnow().strftime("%H:%M:%S")
                 reply_text = (
-                    f"Echo ({timestamp}): I received your message — '{last_user_message}'. "
+                    f"{_echo_prefix()}I received your message — '{last_user_message}'. "
                     "This is a demo assistant response."
                 )
         else:
             # No agent available, use demo response
-            timestamp = datetime.utcnow().strftime("%H:%M:%S")
             reply_text = (
-                f"Echo ({timestamp}): I received your message — '{last_user_message}'. "
+                f"{_echo_prefix()}I received your message — '{last_user_message}'. "
                 "This is a demo assistant response."
             )
         
-        reply = ChatMessage.new(user_id=user_id, conversation_id=conversation_id, role="assistant", content=reply_text)
+        reply = self._new_assistant_message(user_id=user_id, conversation_id=conversation_id, content=reply_text)
         self._repository.add_message(reply)
         return reply
 
@@ -148,18 +156,15 @@ class ChatService:
         - type: 'reasoning' for internal steps, 'response' for final answer
         - content: the text to display
         
-        Returns the complete message at the end for persistence.
+        A last ``{"type": "done", "message": reply}`` chunk hands the reply
+        ``ChatMessage`` to the caller, already stored.
         """
         agent = self._get_or_create_agent(openai_api_key=openai_api_key)
         
         if agent is not None:
             try:
-                # Get conversation history
-                history = self.get_conversation_messages(conversation_id)
-                history_dicts = [
-                    {"role": msg.role, "content": msg.content}
-                    for msg in history
-                ]
+                # Conversation history, already in the agent's format, streamed from SQLite
+                history_dicts = self._repository.iter_role_content_by_conversation(conversation_id)
                 
                 # Stream response from agent
                 full_response = ""
@@ -171,46 +176,41 @@ class ChatService:
                 
                 # After streaming, save complete message
                 if full_response:
-                    reply = ChatMessage.new(
+                    reply = self._new_assistant_message(
                         user_id=user_id,
                         conversation_id=conversation_id,
-                        role="assistant",
                         content=full_response
                     )
                     self._repository.add_message(reply)
-                    return reply
+                    yield {"type": "done", "message": reply}
                     
             except Exception as e:
                 print(f"Warning: Agent streaming failed: {e}")
                 import traceback
                 traceback.print_exc()
                 # Fallback
-                timestamp = datetime.utcnow().strftime("%H:%M:%S")
-                fallback_text = f"Echo ({timestamp}): {last_user_message} [fallback - {str(e)}]"
+                fallback_text = f"{_echo_prefix()}{last_user_message} [fallback - {str(e)}]"
                 yield {"type": "response", "content": fallback_text}
                 
-                reply = ChatMessage.new(
+                reply = self._new_assistant_message(
                     user_id=user_id,
                     conversation_id=conversation_id,
-                    role="assistant",
                     content=fallback_text
                 )
                 self._repository.add_message(reply)
-                return reply
+                yield {"type": "done", "message": reply}
         else:
             # No agent, use demo
-            timestamp = datetime.utcnow().strftime("%H:%M:%S")
-            fallback_text = f"Echo ({timestamp}): {last_user_message} [demo]"
+            fallback_text = f"{_echo_prefix()}{last_user_message} [demo]"
             yield {"type": "response", "content": fallback_text}
             
-            reply = ChatMessage.new(
+            reply = self._new_assistant_message(
                 user_id=user_id,
                 conversation_id=conversation_id,
-                role="assistant",
                 content=fallback_text
             )
             self._repository.add_message(reply)
-            return reply
+            yield {"type": "done", "message": reply}
 
     def send_and_reply(self, user_id: str, conversation_id: int, user_content: str, openai_api_key: Optional[str] = None) -> Tuple[ChatMessage, ChatMessage]:
         """Send a message and get a reply (with optional OpenAI API key)."""
@@ -221,6 +221,7 @@ class ChatService:
             last_user_message=user_content,
             openai_api_key=openai_api_key
         )
+        self._repository.flush()
         return user_message, assistant_message
 
 
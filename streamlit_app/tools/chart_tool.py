@@ -1,15 +1,221 @@
 from __future__ import annotations
 
 import json
+import re
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, Literal, Optional, Type
+from typing import Any, Dict, List, Literal, Optional, Sequence, Tuple, Type
 
+import numpy as np
+import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.tools import BaseTool
 from pydantic import BaseModel, Field
 
+from streamlit_app.tools.sqlite_connection import (
+    DBH_COLUMN,
+    DBH_FALLBACK,
+    connect_readonly,
+    is_read_query,
+)
+
+# Max number of (chart_type, query) -> SQL spec translations kept per tool instance
+TRANSLATION_CACHE_SIZE = 512
+# Query results keyed on the generated SQL; the dataset is static, so no TTL
+RESULT_CACHE_SIZE = 128
+# Rows pulled per fetchmany() call when reading query results
+FETCH_CHUNK_SIZE = 10_000
+# Guards for LLM-generated SQL: hard cap on rows read and on wall-clock time
+MAX_RESULT_ROWS = 100_000
+QUERY_TIMEOUT_S = 5.0
+# SQLite VM instructions between two deadline checks
+_PROGRESS_STEPS = 100_000
+
+# Line/scatter series longer than this are downsampled before reaching Plotly
+MAX_PLOT_POINTS = 2000
+
+# Columns of a box-plot query that returns precomputed five-number summaries
+BOX_SUMMARY_COLUMNS = frozenset({"min_value", "q1", "median", "q3", "max_value"})
+
+_BASE_COLUMNS = (
+    "objectid, district, genus_species, plant_year, trunk_circumference, "
+    "tree_height, crown_diameter, object_street, area_group"
+)
+
+# Body of a ```json ... ``` (or bare ```) fenced block in an LLM answer
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.S)
+
+# Line/scatter traces with more points than this are drawn with WebGL
+# (Scattergl) instead of SVG; hover is slightly less precise but rendering
+# no longer creates one DOM node per marker.
+WEBGL_THRESHOLD = 1000
+
+
+# Chart SQL instructions shared by every request. Only {current_year},
+# {columns} and {dbh} are substituted here; the user request and chart type are appended after it so
+# the prompt prefix stays byte-identical across calls.
+_STATIC_PROMPT_TEMPLATE = """You are a SQL expert for data visualization. Generate a SQL query for the chart type and request given at the end.
+
+DATABASE SCHEMA:
+Table: baumkatogd
+Columns: {columns}
+
+IMPORTANT:
+1. Current year is {current_year}
+2. DBH (cm) = {dbh}
+3. Age = {current_year} - plant_year
+4. Return data optimized for the requested chart type
+5. For bar/pie charts: return category and count/value columns
+6. For line charts: return time-based x-axis and y-axis values
+7. For scatter: return two numeric columns, sampled in SQL with ORDER BY RANDOM() LIMIT 5000
+8. For histogram: bin the values in SQL and return bucket and count columns (never raw rows)
+9. For box plots: compute the five-number summary in SQL, one row per category, with columns min_value, q1, median, q3, max_value (see example)
+10. Limit results appropriately (max 50 categories for bar/pie/box, never more than 5000 rows)
+
+Return a JSON object with:
+{{
+    "sql": "the SQL query",
+    "x_column": "name of x-axis column",
+    "y_column": "name of y-axis column (the count column for histogram)",
+    "suggested_title": "suggested chart title in Italian",
+    "x_label": "suggested x-axis label in Italian",
+    "y_label": "suggested y-axis label in Italian"
+}}
+
+Examples:
+
+Request: "Numero di alberi per distretto"
+Chart: bar
+Response:
+{{
+    "sql": "SELECT district, COUNT(*) as count FROM baumkatogd WHERE district IS NOT NULL GROUP BY district ORDER BY district",
+    "x_column": "district",
+    "y_column": "count",
+    "suggested_title": "Numero di Alberi per Distretto",
+    "x_label": "Distretto",
+    "y_label": "Numero di Alberi"
+}}
+
+Request: "Top 10 specie più comuni"
+Chart: bar
+Response:
+{{
+    "sql": "SELECT genus_species, COUNT(*) as count FROM baumkatogd WHERE genus_species IS NOT NULL GROUP BY genus_species ORDER BY count DESC LIMIT 10",
+    "x_column": "genus_species",
+    "y_column": "count",
+    "suggested_title": "Top 10 Specie Più Comuni",
+    "x_label": "Specie",
+    "y_label": "Numero di Alberi"
+}}
+
+Request: "Distribuzione età degli alberi"
+Chart: histogram
+Response:
+{{
+    "sql": "SELECT CAST(({current_year} - plant_year) / 5 AS INTEGER) * 5 as age_bucket, COUNT(*) as count FROM baumkatogd WHERE plant_year > 0 AND plant_year < {current_year} GROUP BY age_bucket ORDER BY age_bucket",
+    "x_column": "age_bucket",
+    "y_column": "count",
+    "suggested_title": "Distribuzione dell'Età degli Alberi",
+    "x_label": "Età (anni)",
+    "y_label": "Frequenza"
+}}
+
+Request: "Confronto DBH per le 10 specie principali"
+Chart: box
+Response:
+{{
+    "sql": "WITH ranked AS (SELECT genus_species, {dbh} AS dbh, ROW_NUMBER() OVER (PARTITION BY genus_species ORDER BY trunk_circumference) AS rn, COUNT(*) OVER (PARTITION BY genus_species) AS n FROM baumkatogd WHERE trunk_circumference > 0 AND genus_species IN (SELECT genus_species FROM baumkatogd WHERE trunk_circumference > 0 AND genus_species IS NOT NULL GROUP BY genus_species ORDER BY COUNT(*) DESC LIMIT 10)) SELECT genus_species, MIN(dbh) AS min_value, MAX(CASE WHEN rn = (n + 3) / 4 THEN dbh END) AS q1, MAX(CASE WHEN rn = (n + 1) / 2 THEN dbh END) AS median, MAX(CASE WHEN rn = (3 * n + 3) / 4 THEN dbh END) AS q3, MAX(dbh) AS max_value FROM ranked GROUP BY genus_species ORDER BY median DESC",
+    "x_column": "genus_species",
+    "y_column": "median",
+    "suggested_title": "Distribuzione del DBH per Specie",
+    "x_label": "Specie",
+    "y_label": "DBH (cm)"
+}}
+
+Now generate the query for the following request."""
+
+
+@lru_cache(maxsize=4)
+def _static_prompt(current_year: int, has_dbh_column: bool) -> str:
+    """Render the static chart prompt once per (year, schema variant)."""
+    return _STATIC_PROMPT_TEMPLATE.format(
+        current_year=current_year,
+        columns=f"{_BASE_COLUMNS}, {DBH_COLUMN}" if has_dbh_column else _BASE_COLUMNS,
+        dbh=DBH_COLUMN if has_dbh_column else DBH_FALLBACK,
+    )
+
+
+def _has_unbounded_join(plan: List[tuple]) -> bool:
+    """Whether an EXPLAIN QUERY PLAN nests one full scan inside another.
+
+    Two SCAN steps under the same parent mean a nested-loop join where
+    neither side is searched through an index (e.g. a forgotten join
+    condition), which grows with the product of the table sizes.
+    """
+    scans_per_parent: Dict[int, int] = {}
+    for _, parent, _, detail in plan:
+        if detail.startswith("SCAN "):
+            scans_per_parent[parent] = scans_per_parent.get(parent, 0) + 1
+    return any(count > 1 for count in scans_per_parent.values())
+
+
+def _row_count(data: Dict[str, Sequence[Any]]) -> int:
+    """Number of rows in a column-oriented query result."""
+    return len(next(iter(data.values()), ()))
+
+
+def _minmax_downsample(x_data: list, y_data: list, n_out: int = MAX_PLOT_POINTS) -> Tuple[Any, Any]:
+    """Reduce an (x, y) series to about ``n_out`` points, keeping its shape.
+
+    Points are sorted by x and split into ``n_out // 2`` equal buckets; the
+    minimum and maximum y of every bucket are kept so peaks and outliers stay
+    visible. Series with non-numeric x values are returned unchanged.
+    """
+    if len(x_data) <= n_out:
+        return x_data, y_data
+    try:
+        x = np.asarray(x_data, dtype=float)
+        y = np.asarray(y_data, dtype=float)
+    except (TypeError, ValueError):
+        return x_data, y_data
+
+    valid = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[valid], y[valid]
+    if len(x) <= n_out:
+        return x.tolist(), y.tolist()
+
+    order = np.argsort(x, kind="stable")
+    x, y = x[order], y[order]
+    edges = np.linspace(0, len(x), n_out // 2 + 1, dtype=int)
+    keep = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        bucket = y[lo:hi]
+        keep.extend(sorted({lo + int(bucket.argmin()), lo + int(bucket.argmax())}))
+    idx = np.asarray(keep)
+    # Plain lists keep the figure JSON-serializable without a custom encoder
+    return x[idx].tolist(), y[idx].tolist()
+
+
+class ChartSQLSpec(BaseModel):
+    """Chart SQL spec the LLM must return (structured output schema)."""
+
+    sql: str = Field(description="The SQL query")
+    x_column: str = Field(description="Name of the x-axis column")
+    y_column: Optional[str] = Field(
+        default=None,
+        description="Name of the y-axis column (the count column for histogram)",
+    )
+    suggested_title: str = Field(description="Suggested chart title in Italian")
+    x_label: str = Field(description="Suggested x-axis label in Italian")
+    y_label: str = Field(description="Suggested y-axis label in Italian")
+
 
 class ChartGenerationInput(BaseModel):
     """Input schema for chart generation tool."""
@@ -84,6 +290,13 @@ class ChartGenerationTool(BaseTool):
 
     _db_path: Path
     _llm: Any = None
+    _structured_llm: Any = None
+    _translation_cache: "OrderedDict[Tuple[str, str], Dict[str, Any]]"
+    _result_cache: "OrderedDict[str, Tuple[Dict[str, tuple], bool]]"
+    _conn: Optional[sqlite3.Connection] = None
+    _conn_lock: Any = None
+    _cache_lock: Any = None
+    _dbh_column_present: Optional[bool] = None
 
     def __init__(self, db_path: Optional[Path] = None, llm: Any = None, **kwargs):
         super().__init__(**kwargs)
@@ -91,137 +304,168 @@ class ChartGenerationTool(BaseTool):
             db_path = Path(__file__).parent.parent.parent / "dataset" / "BAUMKATOGD.db"
         object.__setattr__(self, "_db_path", db_path)
         object.__setattr__(self, "_llm", llm)
+        # Chat models that support it return a validated ChartSQLSpec directly
+        structured_llm = None
+        if llm is not None and hasattr(llm, "with_structured_output"):
+            try:
+                structured_llm = llm.with_structured_output(ChartSQLSpec)
+            except (NotImplementedError, ValueError):
+                # No tool binding on this model: answers are parsed as text
+                structured_llm = None
+        object.__setattr__(self, "_structured_llm", structured_llm)
+        object.__setattr__(self, "_translation_cache", OrderedDict())
+        object.__setattr__(self, "_result_cache", OrderedDict())
+        object.__setattr__(self, "_conn", None)
+        object.__setattr__(self, "_conn_lock", threading.Lock())
+        # Guards _translation_cache; the tool is shared across sessions and threads
+        object.__setattr__(self, "_cache_lock", threading.Lock())
+        object.__setattr__(self, "_dbh_column_present", None)
 
     def _get_connection(self) -> sqlite3.Connection:
-        """Get database connection."""
-        if not self._db_path.exists():
-            raise FileNotFoundError(
-                f"Database not found at {self._db_path}. "
-                f"Run 'python dataset/init_db.py' to create it."
-            )
-        
-        conn = sqlite3.connect(self._db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        """Get the shared read-only database connection, opening it on first use."""
+        if self._conn is None:
+            with self._conn_lock:
+                # Another thread may have opened it while this one waited
+                if self._conn is None:
+                    object.__setattr__(self, "_conn", connect_readonly(self._db_path))
+        return self._conn
     
     def _translate_to_chart_sql(
         self, 
         data_query: str, 
         chart_type: str
     ) -> Dict[str, Any]:
-        """Translate natural language data query to SQL optimized for chart type."""
-        from datetime import datetime
-        import math
-        
-        current_year = datetime.now().year
-        
-        prompt = f"""You are a SQL expert for data visualization. Generate a SQL query for creating a {chart_type} chart.
-
-DATABASE SCHEMA:
-Table: baumkatogd
-Columns: objectid, district, genus_species, plant_year, trunk_circumference, tree_height, crown_diameter, object_street, area_group
-
-IMPORTANT:
-1. Current year is {current_year}
-2. DBH = trunk_circumference / {math.pi}
-3. Age = {current_year} - plant_year
-4. Return data optimized for {chart_type} chart
-5. For bar/pie charts: return category and count/value columns
-6. For line charts: return time-based x-axis and y-axis values
-7. For scatter: return two numeric columns
-8. For histogram: return the raw values to be binned
-9. For box plots: return category and numeric value columns
-10. Limit results appropriately (max 50 categories for bar/pie, no limit for distributions)
-
-USER REQUEST: {data_query}
-CHART TYPE: {chart_type}
+        """Translate natural language data query to SQL optimized for chart type.
 
-Return a JSON object with:
-{{
-    "sql": "the SQL query",
-    "x_column": "name of x-axis column",
-    "y_column": "name of y-axis column (or null for histogram)",
-    "suggested_title": "suggested chart title in Italian",
-    "x_label": "suggested x-axis label in Italian",
-    "y_label": "suggested y-axis label in Italian"
-}}
+        Translations are cached per (chart_type, normalized query), so repeated
+        requests skip the LLM call entirely.
+        """
+        cache_key = (chart_type, data_query.strip().lower())
+        with self._cache_lock:
+            cached = self._translation_cache.get(cache_key)
+            if cached is not None:
+                self._translation_cache.move_to_end(cache_key)
+        if cached is not None:
+            return dict(cached)
 
-Examples:
+        # The LLM call runs outside the lock so other sessions are not held up
+        query_info = self._request_chart_sql(data_query, chart_type)
+        with self._cache_lock:
+            self._translation_cache[cache_key] = query_info
+            if len(self._translation_cache) > TRANSLATION_CACHE_SIZE:
+                self._translation_cache.popitem(last=False)
+        return dict(query_info)
 
-Request: "Numero di alberi per distretto"
-Chart: bar
-Response:
-{{
-    "sql": "SELECT district, COUNT(*) as count FROM baumkatogd WHERE district IS NOT NULL GROUP BY district ORDER BY district",
-    "x_column": "district",
-    "y_column": "count",
-    "suggested_title": "Numero di Alberi per Distretto",
-    "x_label": "Distretto",
-    "y_label": "Numero di Alberi"
-}}
+    def _has_dbh_column(self) -> bool:
+        """Whether the dataset has the generated ``dbh_cm`` column (checked once)."""
+        if self._dbh_column_present is None:
+            try:
+                conn = self._get_connection()
+            except FileNotFoundError:
+                return False
+            with self._conn_lock:
+                columns = {row[1] for row in conn.execute("PRAGMA table_xinfo(baumkatogd)")}
+            object.__setattr__(self, "_dbh_column_present", DBH_COLUMN in columns)
+        return self._dbh_column_present
 
-Request: "Top 10 specie più comuni"
-Chart: bar
-Response:
-{{
-    "sql": "SELECT genus_species, COUNT(*) as count FROM baumkatogd WHERE genus_species IS NOT NULL GROUP BY genus_species ORDER BY count DESC LIMIT 10",
-    "x_column": "genus_species",
-    "y_column": "count",
-    "suggested_title": "Top 10 Specie Più Comuni",
-    "x_label": "Specie",
-    "y_label": "Numero di Alberi"
-}}
+    def _request_chart_sql(self, data_query: str, chart_type: str) -> Dict[str, Any]:
+        """Ask the LLM for the chart SQL spec and parse its JSON answer.
 
-Request: "Distribuzione età degli alberi"
-Chart: histogram
-Response:
-{{
-    "sql": "SELECT ({current_year} - plant_year) as age FROM baumkatogd WHERE plant_year > 0 AND plant_year < {current_year}",
-    "x_column": "age",
-    "y_column": null,
-    "suggested_title": "Distribuzione dell'Età degli Alberi",
-    "x_label": "Età (anni)",
-    "y_label": "Frequenza"
-}}
+        The static instructions go first as a system message and only the
+        request/chart type follow, so providers can cache the shared prefix.
+        Models with structured output return the spec already validated;
+        plain text answers are parsed as (optionally fenced) JSON.
+        """
+        static_prompt = _static_prompt(date.today().year, self._has_dbh_column())
+        dynamic_tail = f"USER REQUEST: {data_query}\nCHART TYPE: {chart_type}"
 
-Now generate the query for: {data_query}"""
-        
         if not self._llm:
             raise ValueError("LLM is required. Initialize ChartGenerationTool with an LLM instance.")
         
-        response = self._llm.invoke(prompt)
+        messages = [SystemMessage(content=static_prompt), HumanMessage(content=dynamic_tail)]
+        if self._structured_llm is not None:
+            try:
+                return self._structured_llm.invoke(messages).model_dump()
+            except (NotImplementedError, ValueError):
+                # Provider rejected the schema or returned an invalid spec;
+                # retry as plain text below
+                pass
+
+        response = self._llm.invoke(messages)
         response_text = response.content if hasattr(response, 'content') else str(response)
         
         # Clean up and parse JSON
-        response_text = response_text.strip()
-        if response_text.startswith('```json'):
-            response_text = response_text.split('```json')[1].split('```')[0].strip()
-        elif response_text.startswith('```'):
-            response_text = response_text.split('```')[1].split('```')[0].strip()
+        match = _FENCE_RE.search(response_text)
+        response_text = match.group(1).strip() if match else response_text.strip()
         
         return json.loads(response_text)
     
-    def _execute_query(self, conn: sqlite3.Connection, sql: str) -> list:
-        """Execute SQL query and return results."""
-        cursor = conn.cursor()
-        cursor.execute(sql)
-        
-        columns = [desc[0] for desc in cursor.description]
-        rows = cursor.fetchall()
-        
-        results = []
-        for row in rows:
-            result_dict = {}
-            for i, col in enumerate(columns):
-                result_dict[col] = row[i]
-            results.append(result_dict)
-        
-        return results
+    def _execute_query(self, conn: sqlite3.Connection, sql: str) -> Tuple[Dict[str, tuple], bool]:
+        """Execute SQL query and return its results column by column.
+
+        Rows are fetched in chunks and transposed straight into per-column
+        values, so the full list of row tuples is never held in memory.
+        Returns the columns and whether the query had more than
+        ``MAX_RESULT_ROWS`` rows (only the first ones are kept).
+        Results are cached per SQL string: the dataset is read-only, so a
+        repeated chart skips parsing, planning and scanning altogether.
+        """
+        # The connection and cache are shared across threads, so serialize access
+        with self._conn_lock:
+            cached = self._result_cache.get(sql)
+            if cached is not None:
+                self._result_cache.move_to_end(sql)
+                data, truncated = cached
+                return dict(data), truncated
+
+            if not is_read_query(sql):
+                raise ValueError("Query rifiutata: sono ammesse solo singole query SELECT")
+
+            plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+            if _has_unbounded_join(plan):
+                raise ValueError(
+                    "Query rifiutata: join senza condizione tra tabelle scansionate per intero"
+                )
+
+            deadline = time.monotonic() + QUERY_TIMEOUT_S
+            conn.set_progress_handler(lambda: time.monotonic() > deadline, _PROGRESS_STEPS)
+            try:
+                cursor = conn.execute(sql)
+                cursor.arraysize = FETCH_CHUNK_SIZE
+                columns = [desc[0] for desc in cursor.description]
+                values: List[list] = [[] for _ in columns]
+                fetched = 0
+                # One row past the cap tells a truncated result from an exact fit
+                while fetched <= MAX_RESULT_ROWS:
+                    chunk = cursor.fetchmany(min(FETCH_CHUNK_SIZE, MAX_RESULT_ROWS + 1 - fetched))
+                    if not chunk:
+                        break
+                    fetched += len(chunk)
+                    for column_values, chunk_values in zip(values, zip(*chunk)):
+                        column_values.extend(chunk_values)
+            except sqlite3.OperationalError as e:
+                if "interrupted" in str(e):
+                    raise ValueError(
+                        f"Query interrotta: superato il limite di {QUERY_TIMEOUT_S:g} secondi"
+                    ) from e
+                raise
+            finally:
+                conn.set_progress_handler(None, 0)
+
+            truncated = fetched > MAX_RESULT_ROWS
+            data = {
+                name: tuple(column_values[:MAX_RESULT_ROWS])
+                for name, column_values in zip(columns, values)
+            }
+            self._result_cache[sql] = (data, truncated)
+            if len(self._result_cache) > RESULT_CACHE_SIZE:
+                self._result_cache.popitem(last=False)
+            return dict(data), truncated
     
     def _create_chart(
         self,
         chart_type: str,
-        data: list,
+        data: Dict[str, Sequence[Any]],
         x_column: str,
         y_column: Optional[str],
         title: str,
@@ -230,7 +474,7 @@ Now generate the query for: {data_query}"""
     ) -> go.Figure:
         """Create Plotly chart based on type and data."""
         
-        if not data:
+        if not _row_count(data):
             # Return empty figure with message
             fig = go.Figure()
             fig.add_annotation(
@@ -242,8 +486,8 @@ Now generate the query for: {data_query}"""
             return fig
         
         # Extract data for plotting
-        x_data = [row[x_column] for row in data]
-        y_data = [row[y_column] for row in data] if y_column else None
+        x_data = data[x_column]
+        y_data = data[y_column] if y_column else None
         
         # Create appropriate chart
         if chart_type == "bar":
@@ -257,31 +501,55 @@ Now generate the query for: {data_query}"""
             ])
             
         elif chart_type == "line":
+            x_data, y_data = _minmax_downsample(x_data, y_data)
+            scatter_cls = go.Scattergl if len(x_data) > WEBGL_THRESHOLD else go.Scatter
             fig = go.Figure(data=[
-                go.Scatter(x=x_data, y=y_data, mode='lines+markers', 
+                scatter_cls(x=x_data, y=y_data, mode='lines+markers', 
                           line=dict(color='#2E7D32', width=2),
                           marker=dict(size=6))
             ])
             
         elif chart_type == "scatter":
+            x_data, y_data = _minmax_downsample(x_data, y_data)
+            scatter_cls = go.Scattergl if len(x_data) > WEBGL_THRESHOLD else go.Scatter
             fig = go.Figure(data=[
-                go.Scatter(x=x_data, y=y_data, mode='markers',
+                scatter_cls(x=x_data, y=y_data, mode='markers',
                           marker=dict(size=8, color='#2E7D32', opacity=0.6))
             ])
             
         elif chart_type == "histogram":
+            if y_data is not None:
+                # Bins already counted in SQL: draw them as adjacent bars
+                fig = go.Figure(data=[
+                    go.Bar(x=x_data, y=y_data, marker_color='#2E7D32')
+                ])
+                fig.update_layout(bargap=0)
+            else:
+                fig = go.Figure(data=[
+                    go.Histogram(x=x_data, marker_color='#2E7D32', nbinsx=30)
+                ])
+            
+        elif chart_type == "box" and BOX_SUMMARY_COLUMNS.issubset(data):
+            # Five-number summary already computed in SQL: one box per row
             fig = go.Figure(data=[
-                go.Histogram(x=x_data, marker_color='#2E7D32', nbinsx=30)
+                go.Box(
+                    x=x_data,
+                    lowerfence=data["min_value"],
+                    q1=data["q1"],
+                    median=data["median"],
+                    q3=data["q3"],
+                    upperfence=data["max_value"],
+                    marker_color='#2E7D32',
+                )
             ])
-            
+
         elif chart_type == "box":
-            # For box plot, we need to group by category
+            # Raw values: group by category
             # x_column is the category, y_column is the value
-            categories = list(set(x_data))
+            df = pd.DataFrame({x_column: x_data, y_column: y_data})
             fig = go.Figure()
-            for cat in categories:
-                values = [row[y_column] for row in data if row[x_column] == cat]
-                fig.add_trace(go.Box(y=values, name=str(cat)))
+            for cat, group in df.groupby(x_column, sort=False):
+                fig.add_trace(go.Box(y=group[y_column].tolist(), name=str(cat)))
         
         else:
             raise ValueError(f"Unsupported chart type: {chart_type}")
@@ -324,10 +592,10 @@ Now generate the query for: {data_query}"""
             final_y_label = y_label or query_info["y_label"]
             
             # Execute query
-            data = self._execute_query(conn, sql)
-            conn.close()
+            data, truncated = self._execute_query(conn, sql)
+            data_points = _row_count(data)
             
-            if not data:
+            if not data_points:
                 return {
                     "success": False,
                     "error": "Nessun dato trovato per la query specificata",
@@ -345,16 +613,24 @@ Now generate the query for: {data_query}"""
                 y_label=final_y_label
             )
             
-            # Return chart as JSON (Plotly's native format)
-            return {
+            # Return the figure as a plain dict: it is serialized once with the
+            # tool message instead of being JSON-encoded into a nested string
+            result = {
                 "success": True,
-                "chart_json": fig.to_json(),
+                "chart": fig.to_dict(),
                 "chart_type": chart_type,
-                "data_points": len(data),
+                "data_points": data_points,
                 "sql_executed": sql,
                 "title": final_title,
-                "description": f"Grafico {chart_type} creato con {len(data)} punti dati"
+                "description": f"Grafico {chart_type} creato con {data_points} punti dati",
+                "truncated": truncated,
             }
+            if truncated:
+                result["warning"] = (
+                    f"La query restituisce più di {MAX_RESULT_ROWS} righe: il grafico "
+                    f"mostra solo le prime {MAX_RESULT_ROWS}"
+                )
+            return result
             
         except FileNotFoundError as e:
             return {"success": False, "error": str(e)}
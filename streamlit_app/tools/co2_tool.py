@@ -1,20 +1,43 @@
 from __future__ import annotations
 
-import sys
-from pathlib import Path
-from typing import Optional, Type
+from functools import lru_cache
+from typing import List, Optional, Type, Union
 
 from langchain_core.tools import BaseTool
 from pydantic import BaseModel, Field
 
-# Add app directory to path
-app_dir = Path(__file__).parent.parent.parent / "app"
-if str(app_dir) not in sys.path:
-    sys.path.insert(0, str(app_dir.parent))
-
 from app.models.co2 import CO2CalculationRequest
 from app.services.co2_service import CO2CalculationService
 
+# Shared by every tool that isn't given its own service
+_DEFAULT_SERVICE = CO2CalculationService()
+
+
+@lru_cache(maxsize=4096)
+def _cached_co2(
+    dbh_cm: float,
+    height_m: float,
+    wood_density_g_cm3: float,
+    carbon_fraction: float,
+    root_shoot_ratio: float,
+    annual_biomass_increment_t: Optional[float],
+) -> dict:
+    """CO2 calculation with the default service, memoized on the (rounded) inputs."""
+    request = CO2CalculationRequest(
+        dbh_cm=dbh_cm,
+        height_m=height_m,
+        wood_density_g_cm3=wood_density_g_cm3,
+        carbon_fraction=carbon_fraction,
+        root_shoot_ratio=root_shoot_ratio,
+        annual_biomass_increment_t=annual_biomass_increment_t,
+    )
+    return _DEFAULT_SERVICE.calculate(request).model_dump()
+
+
+def _round_key(value: Optional[float]) -> Optional[float]:
+    """Round an input to 4 decimals so near-identical requests share a cache entry."""
+    return None if value is None else round(float(value), 4)
+
 
 class CO2CalculationInput(BaseModel):
     """Input schema for CO2 calculation tool."""
@@ -39,6 +62,25 @@ class CO2CalculationInput(BaseModel):
     )
 
 
+class CO2BatchCalculationInput(BaseModel):
+    """Input schema for the batch CO2 calculation tool."""
+
+    dbh_cm: List[float] = Field(description="Diameters at breast height in centimeters, one per tree (each > 0)")
+    height_m: List[float] = Field(description="Tree heights in meters, aligned with dbh_cm (each > 0)")
+    wood_density_g_cm3: Union[float, List[float]] = Field(
+        default=0.6,
+        description="Wood density in g/cm³: one value for all trees or one per tree (default 0.6)",
+    )
+    carbon_fraction: float = Field(
+        default=0.47,
+        description="Carbon fraction of dry biomass (default 0.47)",
+    )
+    root_shoot_ratio: float = Field(
+        default=0.24,
+        description="Root to shoot biomass ratio (default 0.24)",
+    )
+
+
 class CO2CalculationTool(BaseTool):
     """Tool to calculate CO2 sequestration and biomass for a single tree using existing service."""
 
@@ -70,7 +112,7 @@ class CO2CalculationTool(BaseTool):
 
     def __init__(self, service: Optional[CO2CalculationService] = None, **kwargs):
         super().__init__(**kwargs)
-        object.__setattr__(self, "_service", service or CO2CalculationService())
+        object.__setattr__(self, "_service", service or _DEFAULT_SERVICE)
 
     def _run(
         self,
@@ -82,6 +124,17 @@ class CO2CalculationTool(BaseTool):
         annual_biomass_increment_t: Optional[float] = None,
     ) -> dict:
         """Execute the CO2 calculation."""
+        if self._service is _DEFAULT_SERVICE:
+            result = _cached_co2(
+                _round_key(dbh_cm),
+                _round_key(height_m),
+                _round_key(wood_density_g_cm3),
+                _round_key(carbon_fraction),
+                _round_key(root_shoot_ratio),
+                _round_key(annual_biomass_increment_t),
+            )
+            return dict(result)
+
         request = CO2CalculationRequest(
             dbh_cm=dbh_cm,
             height_m=height_m,
@@ -93,3 +146,54 @@ class CO2CalculationTool(BaseTool):
         response = self._service.calculate(request)
         return response.model_dump()
 
+
+class CO2BatchCalculationTool(BaseTool):
+    """Tool to calculate CO2 sequestration and biomass for many trees in one vectorized pass."""
+
+    name: str = "calculate_co2_sequestration_batch"
+    description: str = """
+    Calculate CO2 sequestration and biomass for a list of trees at once.
+    
+    Inputs:
+    - dbh_cm: list of diameters at breast height in centimeters
+    - height_m: list of tree heights in meters (same length as dbh_cm)
+    - wood_density_g_cm3: one wood density for all trees or a list with one per tree (default 0.6)
+    - carbon_fraction: carbon fraction (default 0.47)
+    - root_shoot_ratio: root-to-shoot ratio (default 0.24)
+    
+    Returns JSON with:
+    - tree_count: number of trees
+    - agb_t, bgb_t, total_biomass_t, carbon_t, co2_stock_t: totals in tonnes
+    - co2_stock_t_per_tree: CO2 stock of each tree in tonnes, in input order
+    
+    Use this instead of repeated single-tree calls when the user asks about CO2 for several trees.
+    """
+    args_schema: Type[BaseModel] = CO2BatchCalculationInput
+
+    _service: CO2CalculationService
+
+    def __init__(self, service: Optional[CO2CalculationService] = None, **kwargs):
+        super().__init__(**kwargs)
+        object.__setattr__(self, "_service", service or _DEFAULT_SERVICE)
+
+    def _run(
+        self,
+        dbh_cm: List[float],
+        height_m: List[float],
+        wood_density_g_cm3: Union[float, List[float]] = 0.6,
+        carbon_fraction: float = 0.47,
+        root_shoot_ratio: float = 0.24,
+    ) -> dict:
+        """Execute the batch CO2 calculation."""
+        stocks = self._service.calculate_batch(
+            dbh_cm=dbh_cm,
+            height_m=height_m,
+            wood_density_g_cm3=wood_density_g_cm3,
+            carbon_fraction=carbon_fraction,
+            root_shoot_ratio=root_shoot_ratio,
+        )
+        result: dict = {"tree_count": len(dbh_cm)}
+        for key, values in stocks.items():
+            result[key] = round(float(values.sum()), 6)
+        result["co2_stock_t_per_tree"] = stocks["co2_stock_t"].round(6).tolist()
+        return result
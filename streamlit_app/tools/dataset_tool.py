@@ -1,17 +1,439 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
-import math
+import re
 import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Type
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
 
-from langchain_core.documents import Document
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.tools import BaseTool
-from langchain_core.vectorstores import InMemoryVectorStore
 from langchain_openai import OpenAIEmbeddings
 from pydantic import BaseModel, Field
 
+from streamlit_app.tools.sqlite_connection import (
+    DBH_COLUMN,
+    DBH_FALLBACK,
+    SQL_LITERAL_OR_SPACE_RE,
+    ReadOnlyConnectionPool,
+    is_read_query,
+)
+
+# Exact-match translations kept per normalized question
+SQL_CACHE_SIZE = 512
+# Fetched (columns, rows) kept per executed SQL (whitespace-normalized); the
+# dataset is read-only, so entries never go stale
+RESULT_CACHE_SIZE = 128
+# Minimum cosine similarity for a paraphrased question to reuse cached SQL
+SEMANTIC_CACHE_THRESHOLD = 0.92
+# Approximate token budget per embedding request when embedding result rows
+EMBEDDING_BATCH_TOKENS = 8000
+EMBEDDING_MAX_PARALLEL = 4
+EMBEDDING_MODEL = "text-embedding-3-small"
+# text-embedding-3 models are trained Matryoshka-style, so a shortened vector
+# keeps most of the ranking quality at a fraction of the size
+EMBEDDING_DIMENSIONS = 256
+# Result sets up to this size are returned as-is
+DIRECT_LIMIT = 100
+# Larger result sets are reduced to this many rows (vector ranking, or the
+# first full-text matches)
+VECTOR_SEARCH_LIMIT = 50
+# Rows ever fetched for a single query; appended as LIMIT when the SQL has none
+HARD_CAP = max(DIRECT_LIMIT, VECTOR_SEARCH_LIMIT * 4)
+
+# Static SQL translation instructions: schema, rules and examples. Only
+# schema/year/DBH/FTS are substituted, once; the user question is sent as a
+# separate message after it so the prefix stays byte-identical across calls
+# and providers can cache it.
+_PROMPT_TEMPLATE = """You are a SQL expert. Translate the user's natural language question into a SQLite query.
+
+DATABASE SCHEMA:
+{schema_info}
+
+IMPORTANT NOTES:
+1. Table name is: baumkatogd
+2. Current year is {current_year} (use for age calculations)
+3. DBH (diameter, cm) = {dbh}
+4. Age = {current_year} - plant_year
+5. **ALWAYS USE LIMIT** - NEVER return all rows without LIMIT (max 100 for SELECT *, max 20 for aggregations, LIMIT 1 for single results)
+6. For "mostrami" or "dammi" queries, use SELECT with LIMIT
+{text_search_rule}
+8. Common species keywords: Acer (acero), Tilia (tiglio), Quercus (quercia), Fraxinus (frassino)
+9. For "oldest/newest/largest/smallest" queries, use ORDER BY with LIMIT 1 or LIMIT 10
+10. NEVER use SELECT * without LIMIT - always specify columns and LIMIT
+{summary_rule}
+The user's question is given in the next message.
+
+Return ONLY the SQL query, nothing else. No explanations, no markdown, just the SQL.
+Examples:
+
+Question: "Quanti alberi ci sono?"
+SQL: SELECT COUNT(*) as total FROM baumkatogd
+
+Question: "Quanti alberi nel distretto 19?"
+SQL: SELECT COUNT(*) as total FROM baumkatogd WHERE district = 19
+
+Question: "Mostra gli Acer piantati dopo 2000"
+SQL: SELECT objectid, genus_species, plant_year, district, trunk_circumference FROM baumkatogd WHERE {acer_filter} AND plant_year > 2000 LIMIT 20
+
+Question: "Qual è la specie più comune?"
+SQL: SELECT genus_species, COUNT(*) as count FROM baumkatogd GROUP BY genus_species ORDER BY count DESC LIMIT 1
+
+Question: "Top 5 specie"
+SQL: SELECT genus_species, COUNT(*) as count FROM baumkatogd WHERE genus_species IS NOT NULL GROUP BY genus_species ORDER BY count DESC LIMIT 5
+
+Question: "Statistiche per distretto"
+SQL: SELECT district, COUNT(*) as count, ROUND(AVG({dbh}), 1) as avg_dbh_cm, ROUND(AVG({current_year} - plant_year), 1) as avg_age FROM baumkatogd WHERE district IS NOT NULL GROUP BY district ORDER BY count DESC LIMIT 20
+
+Question: "Alberi con circonferenza > 100"
+SQL: SELECT objectid, genus_species, trunk_circumference, district FROM baumkatogd WHERE trunk_circumference > 100 ORDER BY trunk_circumference DESC LIMIT 20
+
+Question: "Età media alberi distretto 10"
+SQL: SELECT ROUND(AVG({current_year} - plant_year), 1) as avg_age FROM baumkatogd WHERE district = 10 AND plant_year > 0
+
+Question: "Qual è l'albero più vecchio?"
+SQL: SELECT objectid, genus_species, plant_year, district, ({current_year} - plant_year) as age FROM baumkatogd WHERE plant_year > 0 ORDER BY plant_year ASC LIMIT 1
+
+Question: "Mostra i 10 alberi più vecchi"
+SQL: SELECT objectid, genus_species, plant_year, district, ({current_year} - plant_year) as age FROM baumkatogd WHERE plant_year > 0 ORDER BY plant_year ASC LIMIT 10
+
+Now translate the user's question."""
+
+
+# DBH column generated and indexed by init_db.py; older databases fall back to the formula
+_DBH_COLUMN_RE = re.compile(rf"\b{DBH_COLUMN}\b")
+
+# Text-search rule and species filter of the prompt: the FTS5 index built by
+# init_db.py when the database has it, LIKE otherwise
+FTS_TABLE = "baumkatogd_fts"
+_LIKE_RULE = "7. For species searches, use LIKE with % wildcards (case-insensitive)"
+_LIKE_ACER_FILTER = "genus_species LIKE '%Acer%'"
+# The index matches whole tokens, so terms are prefix queries ('acer*' also finds
+# "acerifolia", as LIKE did); text inside a word (German common names such as
+# "Spitzahorn") still needs LIKE
+_FTS_RULE = (
+    "7. For text search on species or street names, filter through the full-text index "
+    f"with prefix terms (word*) instead of LIKE: WHERE rowid IN (SELECT rowid FROM {FTS_TABLE} "
+    f"WHERE {FTS_TABLE} MATCH 'genus_species:acer* AND object_street:ring*'). "
+    "Only for text inside a word, such as German common names (Spitzahorn, Winterlinde), "
+    "use LIKE with % wildcards: genus_species LIKE '%ahorn%'"
+)
+_FTS_ACER_FILTER = f"rowid IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH 'genus_species:acer*')"
+
+
+# Added to the prompt when the database has the pre-aggregated tables built by init_db.py
+SUMMARY_TABLES = ("baumkatogd_by_district", "baumkatogd_by_species")
+_SUMMARY_RULE = (
+    "11. Whole-dataset totals per district or per species are precomputed. When the question "
+    "groups ALL trees by district or by species with no other filter, read "
+    "baumkatogd_by_district (district, tree_count, avg_dbh_cm, avg_plant_year) or "
+    "baumkatogd_by_species (genus_species, tree_count, avg_dbh_cm) instead of aggregating "
+    "baumkatogd; average age = {current_year} - avg_plant_year. Example for \"Statistiche per "
+    "distretto\": SELECT district, tree_count AS count, ROUND(avg_dbh_cm, 1) AS avg_dbh_cm, "
+    "ROUND({current_year} - avg_plant_year, 1) AS avg_age FROM baumkatogd_by_district "
+    "ORDER BY tree_count DESC LIMIT 20\n"
+)
+
+
+@lru_cache(maxsize=4)
+def _static_prompt(
+    schema_info: str, current_year: int, has_fts: bool = False, has_summaries: bool = False
+) -> str:
+    """Render the static SQL prompt once per (schema, year, FTS, summary tables)."""
+    return _PROMPT_TEMPLATE.format(
+        schema_info=schema_info,
+        current_year=current_year,
+        dbh=DBH_COLUMN if _DBH_COLUMN_RE.search(schema_info) else DBH_FALLBACK,
+        text_search_rule=_FTS_RULE if has_fts else _LIKE_RULE,
+        acer_filter=_FTS_ACER_FILTER if has_fts else _LIKE_ACER_FILTER,
+        summary_rule=_SUMMARY_RULE.format(current_year=current_year) if has_summaries else "",
+    )
+
+
+# Opening ```/```sql fence and closing fence of a markdown code block
+_SQL_FENCE_RE = re.compile(r"^```\w*[ \t]*\n?|\n?```$")
+
+
+def _sql_from_response(response: Any) -> str:
+    """Extract the bare SQL from an LLM response, dropping markdown fences."""
+    sql = response.content if hasattr(response, 'content') else str(response)
+    return _SQL_FENCE_RE.sub("", sql.strip()).strip()
+
+
+# Common questions answered with fixed SQL, no LLM call. Patterns must match
+# the whole normalized question, so anything more specific (a species, a
+# year range, ...) falls through to the LLM.
+_SQL_TEMPLATES: List[Tuple[re.Pattern, Callable[[re.Match, int], str]]] = [
+    (
+        re.compile(r"quanti alberi ci sono(?: in totale)?|quanti alberi ci sono nel dataset"),
+        lambda m, year: "SELECT COUNT(*) as total FROM baumkatogd",
+    ),
+    (
+        re.compile(r"quanti alberi (?:ci sono )?(?:nel|in|del) distretto (\d{1,2})"),
+        lambda m, year: f"SELECT COUNT(*) as total FROM baumkatogd WHERE district = {int(m[1])}",
+    ),
+    (
+        re.compile(r"top (\d{1,2}) specie(?: più comuni| per numero)?"),
+        lambda m, year: (
+            "SELECT genus_species, COUNT(*) as count FROM baumkatogd WHERE genus_species IS NOT NULL "
+            f"GROUP BY genus_species ORDER BY count DESC LIMIT {int(m[1])}"
+        ),
+    ),
+    (
+        re.compile(r"(?:qual è l')?età media (?:degli )?alberi (?:nel |del )?distretto (\d{1,2})"),
+        lambda m, year: (
+            f"SELECT ROUND(AVG({year} - plant_year), 1) as avg_age FROM baumkatogd "
+            f"WHERE district = {int(m[1])} AND plant_year > 0"
+        ),
+    ),
+    (
+        re.compile(r"qual è la specie più comune"),
+        lambda m, year: (
+            "SELECT genus_species, COUNT(*) as count FROM baumkatogd "
+            "GROUP BY genus_species ORDER BY count DESC LIMIT 1"
+        ),
+    ),
+    (
+        re.compile(r"alberi con circonferenza (?:>|maggiore di) (\d{1,4})(?: cm)?"),
+        lambda m, year: (
+            "SELECT objectid, genus_species, trunk_circumference, district FROM baumkatogd "
+            f"WHERE trunk_circumference > {int(m[1])} ORDER BY trunk_circumference DESC LIMIT 20"
+        ),
+    ),
+    (
+        re.compile(r"qual è l'albero più vecchio"),
+        lambda m, year: (
+            f"SELECT objectid, genus_species, plant_year, district, ({year} - plant_year) as age "
+            "FROM baumkatogd WHERE plant_year > 0 ORDER BY plant_year ASC LIMIT 1"
+        ),
+    ),
+    (
+        re.compile(r"(?:mostra|mostrami|dammi) i (\d{1,2}) alberi più vecchi"),
+        lambda m, year: (
+            f"SELECT objectid, genus_species, plant_year, district, ({year} - plant_year) as age "
+            f"FROM baumkatogd WHERE plant_year > 0 ORDER BY plant_year ASC LIMIT {int(m[1])}"
+        ),
+    ),
+]
+
+
+def _template_sql(natural_query: str, current_year: int) -> Optional[str]:
+    """SQL for a question matching one of the fixed templates, else None."""
+    normalized = " ".join(natural_query.lower().split()).rstrip("?.! ")
+    for pattern, build_sql in _SQL_TEMPLATES:
+        match = pattern.fullmatch(normalized)
+        if match:
+            return build_sql(match, current_year)
+    return None
+
+
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)?")
+# LIMIT closing the statement (a LIMIT inside a subquery does not bound the result)
+_TRAILING_LIMIT_RE = re.compile(r"\blimit\s+\d+(?:\s*(?:,|\boffset\b)\s*\d+)?\s*$", re.I)
+_AGGREGATE_RE = re.compile(r"\b(?:count|sum|avg|min|max|total|group_concat)\s*\(", re.I)
+_GROUP_BY_RE = re.compile(r"\bgroup\s+by\b", re.I)
+
+
+def _sql_cache_key(sql: str) -> str:
+    """Result-cache key: SQL with whitespace collapsed outside string literals."""
+    collapsed = SQL_LITERAL_OR_SPACE_RE.sub(lambda m: m.group(1) or " ", sql)
+    return collapsed.strip().rstrip(";").rstrip()
+
+
+def _cap_sql(sql: str, cap: int = HARD_CAP) -> str:
+    """Bound a row-returning query that has no LIMIT of its own to ``cap`` rows.
+
+    Aggregates without GROUP BY return a single row and are left alone.
+    WITH queries are wrapped as ``SELECT * FROM (...) LIMIT cap``, since a
+    trailing LIMIT may belong to the last CTE rather than the statement.
+    """
+    stripped = sql.strip().rstrip(";").rstrip()
+    code = SQL_LITERAL_OR_SPACE_RE.sub(lambda m: "''" if m.group(1) else " ", stripped).strip()
+    lowered = code.lower()
+    if not lowered.startswith(("select", "with")):
+        return sql
+    if _AGGREGATE_RE.search(code) and not _GROUP_BY_RE.search(code):
+        return sql
+    if lowered.startswith("with"):
+        return f"SELECT * FROM ({stripped}) LIMIT {cap}"
+    if _TRAILING_LIMIT_RE.search(code):
+        return sql
+    return f"{stripped} LIMIT {cap}"
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length so dot products are cosine similarities."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the ``k`` highest scores, best first (partial selection, no full sort)."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=int)
+    if k < len(scores):
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(len(scores))
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def _pack_by_tokens(texts: List[str], max_tokens: int = EMBEDDING_BATCH_TOKENS) -> List[List[str]]:
+    """Greedily split texts into consecutive batches of about ``max_tokens`` each.
+
+    Tokens are estimated as ``len(text) // 4``; a text larger than the budget
+    gets a batch of its own.
+    """
+    batches: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for text in texts:
+        tokens = len(text) // 4 + 1
+        if current and current_tokens + tokens > max_tokens:
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _embed_in_token_batches(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """Embed texts in token-balanced batches, sending the batches concurrently."""
+    batches = _pack_by_tokens(texts)
+    if len(batches) <= 1:
+        return embeddings.embed_documents(texts)
+    with ThreadPoolExecutor(max_workers=min(EMBEDDING_MAX_PARALLEL, len(batches))) as executor:
+        results = executor.map(embeddings.embed_documents, batches)
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+
+class SemanticSQLCache:
+    """Reuse SQL translations for paraphrased questions via embedding similarity.
+
+    Questions that differ in their numbers ("distretto 19" vs "distretto 10")
+    embed almost identically, so a hit also requires the same numeric literals.
+    With ``store_path`` the entries are also kept in a small SQLite file and
+    reloaded on startup, so a restart does not lose them. Stored rows carry
+    the year and prompt hash they were translated under; rows from another
+    year (age arithmetic) or another schema/prompt are ignored on load.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        store_path: Optional[Path] = None,
+        current_year: Optional[int] = None,
+        prompt_hash: str = "",
+    ) -> None:
+        self._embeddings = embeddings
+        self._threshold = threshold
+        self.current_year = current_year if current_year is not None else date.today().year
+        self.prompt_hash = prompt_hash
+        # Unit-norm question embeddings stored as float16: they are only
+        # ranked against the threshold, so the rounding is harmless
+        self._matrix: Optional[np.ndarray] = None
+        self._entries: List[tuple] = []  # (question, numbers, sql)
+        self._lock = threading.Lock()
+        self._store_path = Path(store_path) if store_path is not None else None
+        if self._store_path is not None:
+            self._load_store()
+
+    def lookup(self, natural_query: str) -> tuple:
+        """Return ``(sql or None, query embedding)``; pass the embedding on to ``add``."""
+        vector = _normalize_rows(np.asarray([self._embeddings.embed_query(natural_query)], dtype=np.float32))[0]
+        with self._lock:
+            if self._matrix is not None and self._matrix.shape[1] != vector.shape[0]:
+                # Stored entries come from a different embedding model: start over
+                self._matrix, self._entries = None, []
+                self._write_store("DELETE FROM nl2sql_cache")
+            if self._matrix is not None:
+                scores = self._matrix.astype(np.float32) @ vector
+                best = int(scores.argmax())
+                _, numbers, sql = self._entries[best]
+                if scores[best] >= self._threshold and numbers == _NUMBER_RE.findall(natural_query):
+                    return sql, vector
+        return None, vector
+
+    def add(self, natural_query: str, vector: np.ndarray, sql: str) -> None:
+        row = np.asarray(vector, dtype=np.float16)[np.newaxis, :]
+        with self._lock:
+            self._append(natural_query, row, sql)
+            self._write_store(
+                "INSERT OR REPLACE INTO nl2sql_cache "
+                "(question, embedding, sql, year, prompt_hash, created_at) "
+                "VALUES (?, ?, ?, ?, ?, datetime('now'))",
+                (natural_query, row.tobytes(), sql, self.current_year, self.prompt_hash),
+            )
+
+    def _append(self, natural_query: str, row: np.ndarray, sql: str) -> None:
+        self._matrix = row if self._matrix is None else np.vstack([self._matrix, row])
+        self._entries.append((natural_query, _NUMBER_RE.findall(natural_query), sql))
+
+    def _connect_store(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self._store_path.as_posix())
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(nl2sql_cache)")}
+        if columns and "prompt_hash" not in columns:
+            # Unversioned rows from an older release cannot be trusted: start over
+            with connection:
+                connection.execute("DROP TABLE nl2sql_cache")
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS nl2sql_cache (
+                question TEXT PRIMARY KEY,
+                embedding BLOB NOT NULL,
+                sql TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                prompt_hash TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+            """
+        )
+        return connection
+
+    def _load_store(self) -> None:
+        self._store_path.parent.mkdir(parents=True, exist_ok=True)
+        connection = self._connect_store()
+        try:
+            rows = connection.execute(
+                "SELECT question, embedding, sql FROM nl2sql_cache "
+                "WHERE year = ? AND prompt_hash = ? ORDER BY created_at",
+                (self.current_year, self.prompt_hash),
+            ).fetchall()
+        finally:
+            connection.close()
+        for question, embedding, sql in rows:
+            row = np.frombuffer(embedding, dtype=np.float16)[np.newaxis, :]
+            if self._matrix is None or row.shape[1] == self._matrix.shape[1]:
+                self._append(question, row, sql)
+
+    def _write_store(self, statement: str, params: tuple = ()) -> None:
+        """Apply a write to the persistent store, if any; failures only cost persistence."""
+        if self._store_path is None:
+            return
+        try:
+            connection = self._connect_store()
+            try:
+                with connection:
+                    connection.execute(statement, params)
+            finally:
+                connection.close()
+        except sqlite3.Error as e:
+            print(f"Semantic SQL cache store failed: {e}")
+
 
 class DatasetQueryInput(BaseModel):
     """Input schema for dataset query tool."""
@@ -73,125 +495,269 @@ class DatasetQueryTool(BaseTool):
 
     _db_path: Path
     _llm: Any = None
+    _fast_llm: Any = None
+    _sql_cache_path: Optional[Path] = None
     _embeddings: Optional[OpenAIEmbeddings] = None
+    _sql_cache: "OrderedDict[str, str]"
+    _result_cache: "OrderedDict[str, Tuple[List[str], List[tuple]]]"
+    _semantic_cache: Optional[SemanticSQLCache] = None
+    _schema_info: Optional[str] = None
+    _pool: Optional[ReadOnlyConnectionPool] = None
+    _cache_lock: Any = None
+    _table_names: Optional[frozenset] = None
 
-    def __init__(self, db_path: Optional[Path] = None, llm: Any = None, **kwargs):
+    def __init__(
+        self,
+        db_path: Optional[Path] = None,
+        llm: Any = None,
+        fast_llm: Any = None,
+        sql_cache_path: Optional[Path] = None,
+        **kwargs,
+    ):
         super().__init__(**kwargs)
         if db_path is None:
             db_path = Path(__file__).parent.parent.parent / "dataset" / "BAUMKATOGD.db"
         object.__setattr__(self, "_db_path", db_path)
         object.__setattr__(self, "_llm", llm)
+        # Optional cheaper model tried first; ``llm`` is only used when its SQL fails validation
+        object.__setattr__(self, "_fast_llm", fast_llm)
+        # SQLite file where paraphrase-cache entries survive restarts (in-memory only if None)
+        object.__setattr__(self, "_sql_cache_path", sql_cache_path)
         
         # Initialize embeddings for vector search (lazy initialization)
         object.__setattr__(self, "_embeddings", None)
+        object.__setattr__(self, "_sql_cache", OrderedDict())
+        object.__setattr__(self, "_result_cache", OrderedDict())
+        object.__setattr__(self, "_semantic_cache", None)
+        object.__setattr__(self, "_schema_info", None)
+        object.__setattr__(self, "_pool", None)
+        # Guards _sql_cache and _result_cache, which _arun reaches from worker threads
+        object.__setattr__(self, "_cache_lock", threading.Lock())
+        object.__setattr__(self, "_table_names", None)
 
-    def _get_connection(self) -> sqlite3.Connection:
-        """Get database connection."""
-        if not self._db_path.exists():
-            raise FileNotFoundError(
-                f"Database not found at {self._db_path}. "
-                f"Run 'python dataset/init_db.py' to create it."
-            )
-        
-        conn = sqlite3.connect(self._db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+    def _get_pool(self) -> ReadOnlyConnectionPool:
+        """Get the pool of read-only database connections, creating it on first use."""
+        if self._pool is None:
+            if not self._db_path.exists():
+                raise FileNotFoundError(
+                    f"Database not found at {self._db_path}. "
+                    f"Run 'python dataset/init_db.py' to create it."
+                )
+            object.__setattr__(self, "_pool", ReadOnlyConnectionPool(self._db_path))
+        return self._pool
     
-    def _get_schema_info(self, conn: sqlite3.Connection) -> str:
-        """Get database schema information."""
-        cursor = conn.cursor()
-        cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='baumkatogd'")
-        schema = cursor.fetchone()
-        return schema[0] if schema else "Schema not found"
+    def _get_schema_info(self) -> str:
+        """Get database schema information (read once, then cached on the tool)."""
+        if self._schema_info is None:
+            with self._get_pool().connection() as conn:
+                schema = conn.execute(
+                    "SELECT sql FROM sqlite_master WHERE type='table' AND name='baumkatogd'"
+                ).fetchone()
+            object.__setattr__(self, "_schema_info", schema[0] if schema else "Schema not found")
+        return self._schema_info
     
-    def _translate_to_sql(self, natural_query: str, schema_info: str) -> str:
-        """Translate natural language query to SQL using LLM."""
-        from datetime import datetime
-        current_year = datetime.now().year
-        
-        prompt = f"""You are a SQL expert. Translate the user's natural language question into a SQLite query.
+    def _dataset_tables(self) -> frozenset:
+        """Names of the tables in the dataset (read once, then cached on the tool)."""
+        if self._table_names is None:
+            try:
+                with self._get_pool().connection() as conn:
+                    rows = conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
+            except FileNotFoundError:
+                return frozenset()
+            object.__setattr__(self, "_table_names", frozenset(name for (name,) in rows))
+        return self._table_names
 
-DATABASE SCHEMA:
-{schema_info}
+    def _has_fts_index(self) -> bool:
+        """Whether the dataset has the ``baumkatogd_fts`` full-text index."""
+        return FTS_TABLE in self._dataset_tables()
 
-IMPORTANT NOTES:
-1. Table name is: baumkatogd
-2. Current year is {current_year} (use for age calculations)
-3. DBH (diameter) = trunk_circumference / {math.pi}
-4. Age = {current_year} - plant_year
-5. **ALWAYS USE LIMIT** - NEVER return all rows without LIMIT (max 100 for SELECT *, max 20 for aggregations, LIMIT 1 for single results)
-6. For "mostrami" or "dammi" queries, use SELECT with LIMIT
-7. For species searches, use LIKE with % wildcards (case-insensitive)
-8. Common species keywords: Acer (acero), Tilia (tiglio), Quercus (quercia), Fraxinus (frassino)
-9. For "oldest/newest/largest/smallest" queries, use ORDER BY with LIMIT 1 or LIMIT 10
-10. NEVER use SELECT * without LIMIT - always specify columns and LIMIT
+    def _has_summary_tables(self) -> bool:
+        """Whether the dataset has the per-district/per-species summary tables."""
+        return self._dataset_tables().issuperset(SUMMARY_TABLES)
 
-USER QUESTION: {natural_query}
+    async def _arun(self, natural_query: str) -> dict:
+        """Async variant of ``_run``.
 
-Return ONLY the SQL query, nothing else. No explanations, no markdown, just the SQL.
-Examples:
+        Schema/FTS lookups and the cache lookup (which may embed the question)
+        run concurrently in worker threads; on a miss the LLM is awaited with
+        ``ainvoke`` so the event loop stays free for other tools.
+        """
+        def prepare_schema() -> str:
+            schema_info = self._get_schema_info()
+            self._dataset_tables()
+            return schema_info
 
-Question: "Quanti alberi ci sono?"
-SQL: SELECT COUNT(*) as total FROM baumkatogd
+        try:
+            schema_info, (sql, cache_key, vector) = await asyncio.gather(
+                asyncio.to_thread(prepare_schema),
+                asyncio.to_thread(self._lookup_sql, natural_query),
+            )
+            if sql is None:
+                sql, valid = await self._arequest_sql(natural_query, schema_info)
+                if valid:
+                    self._store_sql(natural_query, cache_key, vector, sql)
+            
+            result = await asyncio.to_thread(self._execute_sql, sql, natural_query)
+            result["natural_query"] = natural_query
+            return result
+            
+        except FileNotFoundError as e:
+            return {"error": str(e), "natural_query": natural_query}
+        except Exception as e:
+            return {
+                "error": f"Error processing query: {str(e)}",
+                "natural_query": natural_query
+            }
 
-Question: "Quanti alberi nel distretto 19?"
-SQL: SELECT COUNT(*) as total FROM baumkatogd WHERE district = 19
+    def _translate_to_sql(self, natural_query: str, schema_info: str) -> str:
+        """Translate natural language query to SQL, reusing earlier translations.
 
-Question: "Mostra gli Acer piantati dopo 2000"
-SQL: SELECT objectid, genus_species, plant_year, district, trunk_circumference FROM baumkatogd WHERE genus_species LIKE '%Acer%' AND plant_year > 2000 LIMIT 20
+        Common questions are answered from fixed SQL templates; exact repeats
+        (after normalization) hit an LRU; paraphrases are matched by embedding
+        similarity. Only a miss on all three calls the LLM, and its answer is
+        only cached once it validates, so a bad translation is not replayed.
+        """
+        sql, cache_key, vector = self._lookup_sql(natural_query)
+        if sql is None:
+            sql, valid = self._request_sql(natural_query, schema_info)
+            if valid:
+                self._store_sql(natural_query, cache_key, vector, sql)
+        return sql
 
-Question: "Qual è la specie più comune?"
-SQL: SELECT genus_species, COUNT(*) as count FROM baumkatogd GROUP BY genus_species ORDER BY count DESC LIMIT 1
+    def _lookup_sql(self, natural_query: str) -> Tuple[Optional[str], str, Optional[np.ndarray]]:
+        """Return ``(sql or None, cache key, question embedding)`` from templates and caches."""
+        current_year = date.today().year
+        # Age SQL embeds the year, so a translation is only reused within it
+        cache_key = f"{current_year}:{' '.join(natural_query.lower().split())}"
+        template_sql = _template_sql(natural_query, current_year)
+        if template_sql is not None:
+            return template_sql, cache_key, None
 
-Question: "Top 5 specie"
-SQL: SELECT genus_species, COUNT(*) as count FROM baumkatogd WHERE genus_species IS NOT NULL GROUP BY genus_species ORDER BY count DESC LIMIT 5
+        with self._cache_lock:
+            cached = self._sql_cache.get(cache_key)
+            if cached is not None:
+                self._sql_cache.move_to_end(cache_key)
+        if cached is not None:
+            return cached, cache_key, None
 
-Question: "Statistiche per distretto"
-SQL: SELECT district, COUNT(*) as count, ROUND(AVG(trunk_circumference / {math.pi}), 1) as avg_dbh_cm, ROUND(AVG({current_year} - plant_year), 1) as avg_age FROM baumkatogd WHERE district IS NOT NULL GROUP BY district ORDER BY count DESC LIMIT 20
+        semantic_cache = self._get_semantic_cache(current_year)
+        vector = None
+        if semantic_cache is not None:
+            try:
+                sql, vector = semantic_cache.lookup(natural_query)
+            except Exception as e:
+                print(f"Semantic SQL cache lookup failed: {e}")
+                sql = None
+            if sql is not None:
+                self._remember_sql(cache_key, sql)
+                return sql, cache_key, vector
+        return None, cache_key, vector
 
-Question: "Alberi con circonferenza > 100"
-SQL: SELECT objectid, genus_species, trunk_circumference, district FROM baumkatogd WHERE trunk_circumference > 100 ORDER BY trunk_circumference DESC LIMIT 20
+    def _store_sql(self, natural_query: str, cache_key: str, vector: Optional[np.ndarray], sql: str) -> None:
+        """Remember an LLM translation in the exact and semantic caches."""
+        self._remember_sql(cache_key, sql)
+        if self._semantic_cache is not None and vector is not None:
+            self._semantic_cache.add(natural_query, vector, sql)
 
-Question: "Età media alberi distretto 10"
-SQL: SELECT ROUND(AVG({current_year} - plant_year), 1) as avg_age FROM baumkatogd WHERE district = 10 AND plant_year > 0
+    def _remember_sql(self, cache_key: str, sql: str) -> None:
+        with self._cache_lock:
+            self._sql_cache[cache_key] = sql
+            if len(self._sql_cache) > SQL_CACHE_SIZE:
+                self._sql_cache.popitem(last=False)
 
-Question: "Qual è l'albero più vecchio?"
-SQL: SELECT objectid, genus_species, plant_year, district, ({current_year} - plant_year) as age FROM baumkatogd WHERE plant_year > 0 ORDER BY plant_year ASC LIMIT 1
+    def _get_semantic_cache(self, current_year: int) -> Optional[SemanticSQLCache]:
+        """Semantic cache over the tool's embeddings, or None if they are unavailable.
 
-Question: "Mostra i 10 alberi più vecchi"
-SQL: SELECT objectid, genus_species, plant_year, district, ({current_year} - plant_year) as age FROM baumkatogd WHERE plant_year > 0 ORDER BY plant_year ASC LIMIT 10
+        The cache is rebuilt when the year changes, so entries translated with
+        last year's age arithmetic are dropped.
+        """
+        if self._semantic_cache is None or self._semantic_cache.current_year != current_year:
+            try:
+                embeddings = self._init_embeddings()
+                prompt_hash = self._prompt_hash(current_year)
+            except Exception:
+                return None
+            object.__setattr__(
+                self,
+                "_semantic_cache",
+                SemanticSQLCache(
+                    embeddings,
+                    store_path=self._sql_cache_path,
+                    current_year=current_year,
+                    prompt_hash=prompt_hash,
+                ),
+            )
+        return self._semantic_cache
 
-Now translate this question:
-{natural_query}"""
-        
+    def _prompt_hash(self, current_year: int) -> str:
+        """Short digest of the static prompt, which covers schema, year and rules."""
+        static_prompt = _static_prompt(
+            self._get_schema_info(), current_year, self._has_fts_index(), self._has_summary_tables()
+        )
+        return hashlib.sha256(static_prompt.encode("utf-8")).hexdigest()[:16]
+
+    def _sql_messages(self, natural_query: str, schema_info: str) -> List[Any]:
+        """Messages for the SQL translation request.
+
+        The static instructions go first as a system message and only the
+        question follows, so providers can cache the shared prefix.
+        """
         if not self._llm:
             raise ValueError(
                 "LLM is required for natural language to SQL translation. "
                 "Please initialize DatasetQueryTool with an LLM instance."
             )
         
-        response = self._llm.invoke(prompt)
-        sql = response.content if hasattr(response, 'content') else str(response)
-        
-        # Clean up response
-        sql = sql.strip()
-        # Remove markdown code blocks if present
-        if sql.startswith('```'):
-            lines = sql.split('\n')
-            # Remove first line if it's ```sql or ```
-            if lines[0].startswith('```'):
-                sql = '\n'.join(lines[1:])
-        if sql.endswith('```'):
-            sql = sql.rsplit('\n```', 1)[0]
-        
-        sql = sql.strip()
-        return sql
+        static_prompt = _static_prompt(
+            schema_info, date.today().year, self._has_fts_index(), self._has_summary_tables()
+        )
+        return [SystemMessage(content=static_prompt), HumanMessage(content=natural_query)]
+
+    def _request_sql(self, natural_query: str, schema_info: str) -> Tuple[str, bool]:
+        """Translate natural language query to SQL using LLM.
+
+        With a fast model configured it is asked first, and the main model is
+        only called when the fast answer does not validate. Returns the SQL
+        and whether it passed ``_validate_sql``.
+        """
+        messages = self._sql_messages(natural_query, schema_info)
+        if self._fast_llm is not None:
+            sql = _sql_from_response(self._fast_llm.invoke(messages))
+            if self._validate_sql(sql):
+                return sql, True
+        sql = _sql_from_response(self._llm.invoke(messages))
+        return sql, self._validate_sql(sql)
+
+    async def _arequest_sql(self, natural_query: str, schema_info: str) -> Tuple[str, bool]:
+        """Async variant of ``_request_sql`` using the models' ``ainvoke``."""
+        messages = self._sql_messages(natural_query, schema_info)
+        if self._fast_llm is not None:
+            sql = _sql_from_response(await self._fast_llm.ainvoke(messages))
+            if await asyncio.to_thread(self._validate_sql, sql):
+                return sql, True
+        sql = _sql_from_response(await self._llm.ainvoke(messages))
+        return sql, await asyncio.to_thread(self._validate_sql, sql)
+
+    def _validate_sql(self, sql: str) -> bool:
+        """Whether ``sql`` is a read query on the dataset that SQLite can compile."""
+        if not is_read_query(sql) or "baumkatogd" not in sql.lower():
+            return False
+        try:
+            with self._get_pool().connection() as conn:
+                conn.execute(f"EXPLAIN {sql}").fetchall()
+        except (FileNotFoundError, sqlite3.Error):
+            return False
+        return True
     
 
     def _init_embeddings(self) -> OpenAIEmbeddings:
         """Initialize embeddings (lazy initialization)."""
         if self._embeddings is None:
-            object.__setattr__(self, "_embeddings", OpenAIEmbeddings(model="text-embedding-3-small"))
+            object.__setattr__(
+                self,
+                "_embeddings",
+                OpenAIEmbeddings(model=EMBEDDING_MODEL, dimensions=EMBEDDING_DIMENSIONS),
+            )
         return self._embeddings
     
     def _semantic_filter_results(
@@ -201,124 +767,132 @@ Now translate this question:
         natural_query: str, 
         top_k: int = 50
     ) -> List[Dict[str, Any]]:
-        """Use LangChain InMemoryVectorStore to filter large result sets to most relevant items."""
+        """Filter large result sets to the rows most similar to the question.
+
+        All row texts are embedded in a single ``embed_documents`` batch and
+        ranked against the query embedding with one matrix product and a
+        partial top-k selection.
+        """
         try:
             # Initialize embeddings
             embeddings = self._init_embeddings()
             
-            # Convert rows to LangChain Documents with metadata
-            documents = []
+            # Create searchable text from each row
+            row_dicts = [dict(zip(columns, row)) for row in rows]
+            texts = [
+                " | ".join(f"{col}: {val}" for col, val in row_dict.items() if val is not None)
+                for row_dict in row_dicts
+            ]
             
-            for idx, row in enumerate(rows):
-                # Create a dict representation of the row
-                row_dict = {columns[i]: row[i] for i in range(len(columns))}
-                
-                # Create searchable text from row
-                text_parts = []
-                for col, val in row_dict.items():
-                    if val is not None:
-                        text_parts.append(f"{col}: {val}")
-                page_content = " | ".join(text_parts)
-                
-                # Create LangChain Document with metadata
-                doc = Document(
-                    page_content=page_content,
-                    metadata=row_dict
-                )
-                documents.append(doc)
-            
-            # Create InMemoryVectorStore with documents
-            vectorstore = InMemoryVectorStore.from_documents(
-                documents=documents,
-                embedding=embeddings
-            )
-            
-            # Perform similarity search with natural language query
-            similar_docs = vectorstore.similarity_search(
-                query=natural_query,
-                k=min(top_k, len(rows))
-            )
+            doc_vectors = _normalize_rows(np.asarray(_embed_in_token_batches(embeddings, texts), dtype=np.float32))
+            query_vector = _normalize_rows(np.asarray([embeddings.embed_query(natural_query)], dtype=np.float32))[0]
             
-            # Extract metadata (which contains the actual row data)
-            filtered_results = [doc.metadata for doc in similar_docs]
+            # Highest cosine similarity first
+            best = _top_k_indices(doc_vectors @ query_vector, top_k)
             
-            return filtered_results
+            return [row_dicts[i] for i in best]
             
         except Exception as e:
             # If vector search fails, fall back to simple truncation
             print(f"Vector search failed: {e}, falling back to truncation")
-            return [{columns[i]: row[i] for i in range(len(columns))} for row in rows[:top_k]]
+            return [dict(zip(columns, row)) for row in rows[:top_k]]
     
-    def _execute_sql(self, conn: sqlite3.Connection, sql: str, natural_query: str = "") -> Dict[str, Any]:
+    def _execute_sql(self, sql: str, natural_query: str = "") -> Dict[str, Any]:
         """Execute SQL query and format results."""
-        # Thresholds
-        DIRECT_LIMIT = 100  # Direct return if <= this
-        VECTOR_SEARCH_LIMIT = 50  # Return top N via vector search if > DIRECT_LIMIT
+        if not is_read_query(sql):
+            return {
+                "error": "Only single read-only SELECT queries are allowed",
+                "sql_attempted": sql
+            }
+        sql = _cap_sql(sql)
         
         try:
-            cursor = conn.cursor()
-            cursor.execute(sql)
+            with self._cache_lock:
+                cache_key = _sql_cache_key(sql)
+                cached = self._result_cache.get(cache_key)
+                if cached is not None:
+                    self._result_cache.move_to_end(cache_key)
+            if cached is not None:
+                # Read-only dataset: the same SQL always returns the same rows
+                columns, rows = cached
+            else:
+                with self._get_pool().connection() as conn:
+                    cursor = conn.execute(sql)
+                    if cursor.description is None:
+                        # Reads always describe their columns; anything else is refused
+                        return {
+                            "error": "Query returned no result columns",
+                            "sql_attempted": sql
+                        }
+                    columns = [desc[0] for desc in cursor.description]
+                    # Small results need a single bounded fetch; only drain the
+                    # rest (up to HARD_CAP) when ranking is actually needed
+                    rows = cursor.fetchmany(DIRECT_LIMIT + 1)
+                    if len(rows) > DIRECT_LIMIT:
+                        rows += cursor.fetchmany(HARD_CAP - len(rows))
+                with self._cache_lock:
+                    self._result_cache[cache_key] = (columns, rows)
+                    if len(self._result_cache) > RESULT_CACHE_SIZE:
+                        self._result_cache.popitem(last=False)
             
-            # Get column names
-            if cursor.description:
-                columns = [desc[0] for desc in cursor.description]
-                rows = cursor.fetchall()
-                
-                # Format results based on query type
-                if len(rows) == 0:
-                    return {
-                        "sql_executed": sql,
-                        "result": "No results found",
-                        "row_count": 0
-                    }
-                
-                # Single value result (COUNT, AVG, etc.)
-                if len(columns) == 1 and len(rows) == 1:
-                    return {
-                        "sql_executed": sql,
-                        "result": rows[0][0],
-                        "column": columns[0]
-                    }
+            # Format results based on query type
+            if len(rows) == 0:
+                return {
+                    "sql_executed": sql,
+                    "result": "No results found",
+                    "row_count": 0
+                }
+            
+            # Single value result (COUNT, AVG, etc.)
+            if len(columns) == 1 and len(rows) == 1:
+                return {
+                    "sql_executed": sql,
+                    "result": rows[0][0],
+                    "column": columns[0]
+                }
+            
+            # Multiple rows - check if we need vector search
+            total_rows = len(rows)
+            # Hitting the cap means the query may match more rows than were fetched
+            total_label = f"at least {total_rows}" if total_rows >= HARD_CAP else str(total_rows)
+            
+            if total_rows <= DIRECT_LIMIT:
+                # Direct return for small result sets
+                results = [dict(zip(columns, row)) for row in rows]
                 
-                # Multiple rows - check if we need vector search
-                total_rows = len(rows)
+                return {
+                    "sql_executed": sql,
+                    "results": results,
+                    "row_count": len(results),
+                    "columns": columns
+                }
+            elif FTS_TABLE in sql.lower():
+                # Full-text search already narrowed the rows in SQL: return the
+                # first matches as they are, without embedding them
+                results = [dict(zip(columns, row)) for row in rows[:VECTOR_SEARCH_LIMIT]]
                 
-                if total_rows <= DIRECT_LIMIT:
-                    # Direct return for small result sets
-                    results = []
-                    for row in rows:
-                        result_dict = {}
-                        for i, col in enumerate(columns):
-                            result_dict[col] = row[i]
-                        results.append(result_dict)
-                    
-                    return {
-                        "sql_executed": sql,
-                        "results": results,
-                        "row_count": len(results),
-                        "columns": columns
-                    }
-                else:
-                    # Use vector search for large result sets
-                    filtered_results = self._semantic_filter_results(
-                        rows, columns, natural_query, top_k=VECTOR_SEARCH_LIMIT
-                    )
-                    
-                    return {
-                        "sql_executed": sql,
-                        "results": filtered_results,
-                        "row_count": len(filtered_results),
-                        "columns": columns,
-                        "vector_search_applied": True,
-                        "total_rows_found": total_rows,
-                        "info": f"Vector search applied: showing top {len(filtered_results)} most relevant results out of {total_rows} total rows"
-                    }
+                return {
+                    "sql_executed": sql,
+                    "results": results,
+                    "row_count": len(results),
+                    "columns": columns,
+                    "total_rows_found": total_rows,
+                    "warning": f"Showing the first {len(results)} of {total_label} full-text matches"
+                }
             else:
-                # Query executed but no results (INSERT, UPDATE, etc.)
+                # Use vector search for large result sets
+                filtered_results = self._semantic_filter_results(
+                    rows, columns, natural_query, top_k=VECTOR_SEARCH_LIMIT
+                )
+                
                 return {
                     "sql_executed": sql,
-                    "result": "Query executed successfully",
-                    "rows_affected": cursor.rowcount
+                    "results": filtered_results,
+                    "row_count": len(filtered_results),
+                    "columns": columns,
+                    "vector_search_applied": True,
+                    "total_rows_found": total_rows,
+                    "info": f"Vector search applied: showing top {len(filtered_results)} most relevant results out of {total_label} total rows"
                 }
                 
         except sqlite3.Error as e:
@@ -330,20 +904,14 @@ Now translate this question:
     def _run(self, natural_query: str) -> dict:
         """Execute natural language query by translating to SQL."""
         try:
-            # Connect to database
-            conn = self._get_connection()
-            
             # Get schema information
-            schema_info = self._get_schema_info(conn)
+            schema_info = self._get_schema_info()
             
             # Translate natural language to SQL
             sql = self._translate_to_sql(natural_query, schema_info)
             
             # Execute SQL and get results (pass natural query for semantic filtering)
-            result = self._execute_sql(conn, sql, natural_query=natural_query)
-            
-            # Close connection
-            conn.close()
+            result = self._execute_sql(sql, natural_query=natural_query)
             
             # Add the original query to the result
             result["natural_query"] = natural_query
@@ -1,20 +1,66 @@
 from __future__ import annotations
 
-import sys
-from pathlib import Path
-from typing import Optional, Type
+import copy
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import List, Optional, Type
 
 from langchain_core.tools import BaseTool
 from pydantic import BaseModel, Field
 
-# Add app directory to path
-app_dir = Path(__file__).parent.parent.parent / "app"
-if str(app_dir) not in sys.path:
-    sys.path.insert(0, str(app_dir.parent))
-
-from app.models.environment import EnvironmentalEstimatesRequest, TreeInput
+from app.models.environment import (
+    EnvironmentalEstimatesRequest,
+    MetaInput,
+    MethodInput,
+    SiteInput,
+    TreeInput,
+)
 from app.services.environment_service import EnvironmentalEstimationService
 
+# Shared by every tool that isn't given its own service
+_DEFAULT_SERVICE = EnvironmentalEstimationService()
+
+
+def _request_meta() -> MetaInput:
+    """Request metadata for an agent call, stamped with the current time."""
+    return MetaInput(
+        request_id="environment-tool",
+        timestamp=datetime.now(timezone.utc),
+        source="ui",
+    )
+
+
+def _build_request(
+    diameter_cm: float, height_m: Optional[float], carbon_fraction: float
+) -> EnvironmentalEstimatesRequest:
+    """Service request for a tree; site/method are fixed for agent calls."""
+    return EnvironmentalEstimatesRequest(
+        tree=TreeInput(
+            diameter_cm=diameter_cm,
+            height_m=height_m,
+            carbon_fraction=carbon_fraction,
+        ),
+        site=SiteInput(site_id="agent"),
+        method=MethodInput(),
+        meta=_request_meta(),
+    )
+
+
+@lru_cache(maxsize=4096)
+def _cached_results(diameter_cm: float, height_m: Optional[float], carbon_fraction: float) -> dict:
+    """``results`` block of the default service, memoized on the (rounded) inputs.
+
+    Only the pure computation is cached: request metadata and the service's
+    logging are handled fresh on every call by the tool.
+    """
+    request = _build_request(diameter_cm, height_m, carbon_fraction)
+    return _DEFAULT_SERVICE.compute_results(_DEFAULT_SERVICE.normalize_inputs(request))
+
+
+def _round_key(value: Optional[float]) -> Optional[float]:
+    """Round an input to 4 decimals so near-identical requests share a cache entry."""
+    return None if value is None else round(float(value), 4)
+
 
 class EnvironmentEstimationInput(BaseModel):
     """Input schema for environmental estimation tool."""
@@ -30,6 +76,20 @@ class EnvironmentEstimationInput(BaseModel):
     )
 
 
+class EnvironmentBatchEstimationInput(BaseModel):
+    """Input schema for the batch environmental estimation tool."""
+
+    diameter_cm: List[float] = Field(description="Diameters at breast height in centimeters, one per tree (each > 0)")
+    height_m: Optional[List[Optional[float]]] = Field(
+        default=None,
+        description="Tree heights in meters aligned with diameter_cm (optional; null entries use the diameter-only formula)",
+    )
+    carbon_fraction: float = Field(
+        default=0.47,
+        description="Carbon fraction of dry biomass (default 0.47)",
+    )
+
+
 class EnvironmentEstimationTool(BaseTool):
     """Tool to compute environmental estimates (volume, biomass, carbon) using existing service."""
 
@@ -57,7 +117,7 @@ class EnvironmentEstimationTool(BaseTool):
 
     def __init__(self, service: Optional[EnvironmentalEstimationService] = None, **kwargs):
         super().__init__(**kwargs)
-        object.__setattr__(self, "_service", service or EnvironmentalEstimationService())
+        object.__setattr__(self, "_service", service or _DEFAULT_SERVICE)
 
     def _run(
         self,
@@ -66,13 +126,59 @@ class EnvironmentEstimationTool(BaseTool):
         carbon_fraction: float = 0.47,
     ) -> dict:
         """Execute the environmental estimation."""
-        request = EnvironmentalEstimatesRequest(
-            tree=TreeInput(
-                diameter_cm=diameter_cm,
-                height_m=height_m,
-                carbon_fraction=carbon_fraction,
-            )
+        request = _build_request(diameter_cm, height_m, carbon_fraction)
+        if self._service is not _DEFAULT_SERVICE:
+            return self._service.computeEnvironmentalEstimates(request).model_dump()
+
+        normalized_inputs = self._service.normalize_inputs(request)
+        # The results are nested: log and return a deep copy so nothing alters the cache
+        results = copy.deepcopy(
+            _cached_results(_round_key(diameter_cm), _round_key(height_m), _round_key(carbon_fraction))
         )
-        response = self._service.computeEnvironmentalEstimates(request)
-        return response.model_dump()
+        return self._service.build_response(normalized_inputs, results).model_dump()
+
+
+class EnvironmentBatchEstimationTool(BaseTool):
+    """Tool to compute environmental estimates for many trees in one vectorized pass."""
+
+    name: str = "calculate_environmental_estimates_batch"
+    description: str = """
+    Calculate volume, biomass, and carbon stock for a list of trees at once.
+    
+    Inputs:
+    - diameter_cm: list of diameters at breast height in centimeters
+    - height_m: list of tree heights in meters, same length (optional; missing heights use the diameter-only formula)
+    - carbon_fraction: carbon fraction (default 0.47)
+    
+    Returns JSON with:
+    - tree_count: number of trees
+    - volume_dm3, biomass_kg, carbon_stock_kg: totals
+    - carbon_stock_kg_per_tree: carbon stock of each tree in kilograms, in input order
+    
+    Use this instead of repeated single-tree calls when the user asks about several trees.
+    """
+    args_schema: Type[BaseModel] = EnvironmentBatchEstimationInput
+
+    _service: EnvironmentalEstimationService
+
+    def __init__(self, service: Optional[EnvironmentalEstimationService] = None, **kwargs):
+        super().__init__(**kwargs)
+        object.__setattr__(self, "_service", service or _DEFAULT_SERVICE)
 
+    def _run(
+        self,
+        diameter_cm: List[float],
+        height_m: Optional[List[Optional[float]]] = None,
+        carbon_fraction: float = 0.47,
+    ) -> dict:
+        """Execute the batch environmental estimation."""
+        estimates = self._service.compute_batch(
+            diameter_cm=diameter_cm,
+            height_m=height_m,
+            carbon_fraction=carbon_fraction,
+        )
+        result: dict = {"tree_count": len(diameter_cm)}
+        for key, values in estimates.items():
+            result[key] = round(float(values.sum()), 6)
+        result["carbon_stock_kg_per_tree"] = estimates["carbon_stock_kg"].round(6).tolist()
+        return result
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import math
+import os
+import queue
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Set
+
+# Applied once when a shared read-only dataset connection is opened
+READONLY_PRAGMAS = (
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+)
+# DBH column generated and indexed by init_db.py; prompts for older databases fall
+# back to this inline formula (plain arithmetic rather than a Python UDF, which
+# SQLite would call back once per row)
+DBH_COLUMN = "dbh_cm"
+DBH_FALLBACK = f"trunk_circumference / {round(math.pi, 5)}"
+# Tables and indexes dataset/init_db.py builds for the tools' fast paths (FTS
+# search, summary tables, covering index, planner statistics from ANALYZE)
+INIT_DB_OBJECTS = (
+    "baumkatogd_fts",
+    "baumkatogd_by_district",
+    "baumkatogd_by_species",
+    "idx_dbh_cm",
+    "idx_district_year_circ",
+    "sqlite_stat1",
+)
+# Database files already checked by connect_readonly (warn once per process)
+_schema_checked: Set[str] = set()
+_schema_checked_lock = threading.Lock()
+# Upper bound on pooled read connections (each has its own page cache)
+MAX_POOL_SIZE = 8
+# Authorizer actions allowed on pooled connections: plain (and recursive) SELECTs
+# over tables and functions; ATTACH, PRAGMA and every write are denied at prepare
+_SELECT_ONLY_ACTIONS = frozenset(
+    {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+)
+# Internal statements FTS5 prepares when a query first touches its virtual table:
+# a read-only pragma and a schema-table check (mode=ro still rejects real writes)
+_FTS5_INTERNAL_ACTIONS = frozenset(
+    {(sqlite3.SQLITE_PRAGMA, "data_version"), (sqlite3.SQLITE_UPDATE, "sqlite_master")}
+)
+
+# A single-quoted SQL string literal (group 1) or a run of whitespace
+SQL_LITERAL_OR_SPACE_RE = re.compile(r"('(?:[^']|'')*')|\s+")
+_WRITE_KEYWORD_RE = re.compile(
+    r"\b(?:insert|update|delete|drop|alter|create|attach|detach|pragma|vacuum|reindex)\b", re.I
+)
+
+
+def is_read_query(sql: str) -> bool:
+    """Whether ``sql`` is a single SELECT/WITH statement with no write or admin keywords.
+
+    String literals are blanked first, so ``LIKE '%Create%'`` or ``= 'a;b'`` pass.
+    This is an early, friendly rejection; the pool's authorizer is the real guard.
+    """
+    code = SQL_LITERAL_OR_SPACE_RE.sub(lambda m: "''" if m.group(1) else " ", sql)
+    stripped = code.strip().rstrip(";")
+    return (
+        stripped.lower().startswith(("select", "with"))
+        and ";" not in stripped
+        and _WRITE_KEYWORD_RE.search(stripped) is None
+    )
+
+
+def _select_only_authorizer(action: int, arg1: Optional[str], arg2: Optional[str],
+                            db_name: Optional[str], trigger: Optional[str]) -> int:
+    """``set_authorizer`` callback denying everything but reads."""
+    if action in _SELECT_ONLY_ACTIONS or (action, arg1) in _FTS5_INTERNAL_ACTIONS:
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
+
+
+def connect_readonly(db_path: Path) -> sqlite3.Connection:
+    """Open the dataset read-only, shareable across threads, with tuned pragmas.
+
+    Callers either keep the connection for the tool's lifetime and serialize
+    access with their own lock, or check connections out of a
+    ``ReadOnlyConnectionPool``.
+    """
+    if not db_path.exists():
+        raise FileNotFoundError(
+            f"Database not found at {db_path}. "
+            f"Run 'python dataset/init_db.py' to create it."
+        )
+
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+    for pragma in READONLY_PRAGMAS:
+        conn.execute(pragma)
+    _warn_if_schema_outdated(conn, db_path)
+    return conn
+
+
+def missing_schema_objects(conn: sqlite3.Connection) -> List[str]:
+    """Objects built by ``dataset/init_db.py`` that the dataset lacks (empty if up to date)."""
+    names = {name for (name,) in conn.execute("SELECT name FROM sqlite_master")}
+    missing = [name for name in INIT_DB_OBJECTS if name not in names]
+    columns = {row[1] for row in conn.execute("PRAGMA table_xinfo(baumkatogd)")}
+    if DBH_COLUMN not in columns:
+        missing.insert(0, DBH_COLUMN)
+    return missing
+
+
+def _warn_if_schema_outdated(conn: sqlite3.Connection, db_path: Path) -> None:
+    """Report, once per file, a dataset built before the current ``init_db.py``.
+
+    The tools still work on it, but fall back to the inline DBH formula, LIKE
+    scans and full-table aggregates.
+    """
+    key = str(Path(db_path).resolve())
+    with _schema_checked_lock:
+        if key in _schema_checked:
+            return
+        _schema_checked.add(key)
+    try:
+        missing = missing_schema_objects(conn)
+    except sqlite3.Error:
+        return
+    if missing:
+        print(
+            f"Warning: {db_path} is missing {', '.join(missing)}; queries use slower fallbacks. "
+            f"Run 'python dataset/init_db.py' to rebuild it."
+        )
+
+
+class ReadOnlyConnectionPool:
+    """Bounded pool of read-only connections so queries from concurrent
+    sessions run in parallel instead of queueing on one shared connection.
+
+    Connections are opened on demand up to ``size``; when all are checked out,
+    callers wait for one to be returned. Each connection only authorizes
+    SELECT statements, so model-generated SQL cannot ATTACH, PRAGMA or write.
+    """
+
+    def __init__(self, db_path: Path, size: Optional[int] = None) -> None:
+        self._db_path = db_path
+        self._size = size or min(os.cpu_count() or 1, MAX_POOL_SIZE)
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._opened = 0
+        self._open_lock = threading.Lock()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Check out a connection for the duration of the ``with`` block."""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._open_lock:
+            if self._opened < self._size:
+                conn = connect_readonly(self._db_path)
+                conn.set_authorizer(_select_only_authorizer)
+                self._opened += 1
+                return conn
+        return self._idle.get()
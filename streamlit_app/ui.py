@@ -1,14 +1,100 @@
 from __future__ import annotations
 
 import json
-from typing import List, Optional
+import re
+import time
+from typing import Dict, List, Optional
 
-import plotly.graph_objects as go
 import streamlit as st
 
 from streamlit_app.models import ChatMessage, Conversation
 from streamlit_app.service import ChatService
 
+# Chart tool JSON embedded by the agent between these markers (first pair wins)
+_CHART_MARKERS_RE = re.compile(r"CHART_DATA_START(.*?)CHART_DATA_END", re.DOTALL)
+
+# Messages rendered per rerun before older ones are collapsed behind a button
+MESSAGE_WINDOW = 50
+# Minimum seconds between two redraws of the streaming answer draft
+STREAM_FLUSH_INTERVAL = 0.08
+
+# Per-user counter bumped on create/rename/delete and on timestamp flushes; part
+# of the conversation-list cache key, so sessions sharing this process never
+# read a stale list
+_conversation_versions: Dict[str, int] = {}
+
+
+@st.cache_data(ttl=60, max_entries=128, show_spinner=False)
+def _cached_conversations(user_id: str, version: int, _service: ChatService) -> List[Conversation]:
+    """Conversation list of ``user_id`` at ``version``, shared across reruns and sessions."""
+    return _service.list_user_conversations(user_id)
+
+
+def _bump_conversations(user_id: str) -> None:
+    """Invalidate the cached conversation list of ``user_id``."""
+    _conversation_versions[user_id] = _conversation_versions.get(user_id, 0) + 1
+
+
+# Per-conversation counter bumped whenever messages are appended to it
+_message_epochs: Dict[int, int] = {}
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _cached_messages(conversation_id: int, epoch: int, _service: ChatService) -> List[ChatMessage]:
+    """Messages of ``conversation_id`` at ``epoch``; switching back to a conversation skips the DB."""
+    return _service.get_conversation_messages(conversation_id)
+
+
+def _has_chart(chart_data: dict) -> bool:
+    """Whether a chart tool result carries a figure (new or legacy format)."""
+    return "chart" in chart_data or "chart_json" in chart_data
+
+
+def _chart_figure(chart_data: dict) -> dict:
+    """Plotly figure dict from a chart tool result.
+
+    Messages stored before the tool returned a plain dict carry the figure as
+    a nested JSON string under ``chart_json``.
+    """
+    if "chart" in chart_data:
+        return chart_data["chart"]
+    return json.loads(chart_data["chart_json"])
+
+
+def _parse_chart_response(content: str) -> tuple[str, Optional[dict]]:
+    """Split an assistant response into text and chart tool result (or None)."""
+    # Look for chart data between markers
+    match = _CHART_MARKERS_RE.search(content)
+    if match:
+        try:
+            chart_data = json.loads(match.group(1))
+            if chart_data.get("success") and _has_chart(chart_data):
+                # Remove chart data section from text
+                text_content = (content[:match.start()].strip() + " " + content[match.end():].strip()).strip()
+                return text_content, chart_data
+        except (json.JSONDecodeError, ValueError) as e:
+            print(f"[ERROR UI] Error parsing chart data: {e}")
+
+    # Fallback: try old method (for backward compatibility)
+    if '"chart' in content or '"success": true' in content:
+        try:
+            # Try to extract JSON object from text
+            start_idx = content.find('{')
+            end_idx = content.rfind('}')
+            if start_idx != -1 and end_idx != -1:
+                json_str = content[start_idx:end_idx+1]
+                chart_data = json.loads(json_str)
+                if chart_data.get("success") and _has_chart(chart_data):
+                    # Remove JSON from text
+                    text_before = content[:start_idx].strip()
+                    text_after = content[end_idx+1:].strip()
+                    text_content = (text_before + " " + text_after).strip()
+                    return text_content, chart_data
+        except (json.JSONDecodeError, ValueError):
+            pass
+
+    return content, None
+
 
 class ChatUI:
     """Streamlit UI layer for the chat demo with conversation management."""
@@ -29,120 +115,152 @@ class ChatUI:
         if "messages" not in st.session_state:
             st.session_state.messages: List[ChatMessage] = []
         if "conversations" not in st.session_state:
-            st.session_state.conversations: List[Conversation] = []
-        if "editing_conversation_id" not in st.session_state:
-            st.session_state.editing_conversation_id: Optional[int] = None
+            # Conversations by id, most recent first
+            st.session_state.conversations: Dict[int, Conversation] = {}
+        if "conversations_loaded_for" not in st.session_state:
+            # User whose conversation list is in session state (None: not loaded yet)
+            st.session_state.conversations_loaded_for: Optional[str] = None
+        if "show_all_messages" not in st.session_state:
+            st.session_state.show_all_messages = False
+        if "parsed_responses" not in st.session_state:
+            # Parsed assistant messages of this session, by content (see _render_messages)
+            st.session_state.parsed_responses: Dict[str, tuple[str, Optional[dict]]] = {}
+
+    def _flush_writes(self) -> None:
+        """Persist coalesced conversation timestamps.
+
+        When any ``updated_at`` moved, the cached conversation list is
+        invalidated and the session's copy reloaded in the new order.
+        """
+        if not self._service.flush():
+            return
+        _bump_conversations(st.session_state.user_id)
+        if st.session_state.conversations_loaded_for == st.session_state.user_id:
+            self._load_conversations()
 
     def _load_conversations(self) -> None:
         """Load all conversations for the current user."""
-        st.session_state.conversations = self._service.list_user_conversations(st.session_state.user_id)
+        user_id = st.session_state.user_id
+        st.session_state.conversations = {
+            conv.id: conv
+            for conv in _cached_conversations(user_id, _conversation_versions.get(user_id, 0), self._service)
+        }
+        st.session_state.conversations_loaded_for = st.session_state.user_id
 
     def _load_conversation_messages(self, conversation_id: int) -> None:
         """Load messages for a specific conversation."""
-        st.session_state.messages = self._service.get_conversation_messages(conversation_id)
+        st.session_state.messages = _cached_messages(
+            conversation_id, _message_epochs.get(conversation_id, 0), self._service
+        )
         st.session_state.current_conversation_id = conversation_id
+        st.session_state.show_all_messages = False
 
     def _create_new_conversation(self) -> None:
         """Create a new conversation for the current user."""
         conversation = self._service.create_new_conversation(st.session_state.user_id)
-        st.session_state.conversations.insert(0, conversation)
+        _bump_conversations(st.session_state.user_id)
+        st.session_state.conversations = {conversation.id: conversation, **st.session_state.conversations}
         st.session_state.current_conversation_id = conversation.id
         st.session_state.messages = []
 
+    def _rename_conversation(self, conversation_id: int) -> None:
+        """Rename a conversation to the title typed in its rename input."""
+        new_title = st.session_state[f"rename_input_{conversation_id}"].strip()
+        if new_title:
+            self._service.rename_conversation(conversation_id, new_title)
+            st.session_state.conversations[conversation_id].title = new_title
+            _bump_conversations(st.session_state.user_id)
+
+    def _delete_conversation(self, conversation_id: int) -> None:
+        """Delete a conversation, leaving the chat area if it was the open one."""
+        self._service.delete_conversation(conversation_id)
+        del st.session_state.conversations[conversation_id]
+        _bump_conversations(st.session_state.user_id)
+        if st.session_state.current_conversation_id == conversation_id:
+            st.session_state.current_conversation_id = None
+            st.session_state.messages = []
+
+    def _on_api_key_change(self) -> None:
+        """Persist an edited API key before the rerun the edit triggers."""
+        new_api_key = st.session_state.api_key_input.strip()
+        st.session_state.openai_api_key = new_api_key
+        # Save API key to database
+        if new_api_key:
+            self._service.save_user_api_key(st.session_state.user_id, new_api_key)
+            st.session_state.api_key_saved = True
+
     def _render_sidebar(self) -> None:
         """Render the sidebar with user settings and conversation list."""
         with st.sidebar:
             st.header("⚙️ Settings")
             
             # OpenAI API Key input
-            new_api_key = st.text_input(
+            st.text_input(
                 "OpenAI API Key",
                 value=st.session_state.openai_api_key,
                 type="password",
                 key="api_key_input",
                 help="Inserisci la tua chiave API OpenAI (sk-...). Verrà salvata in modo persistente.",
-                placeholder="sk-..."
+                placeholder="sk-...",
+                on_change=self._on_api_key_change,
             )
-            if new_api_key != st.session_state.openai_api_key:
-                st.session_state.openai_api_key = new_api_key.strip()
-                # Save API key to database
-                if new_api_key.strip():
-                    self._service.save_user_api_key(st.session_state.user_id, new_api_key.strip())
-                    st.success("✅ Chiave API salvata!")
-                # Reset agent to force re-initialization with new key
-                self._service._agent = None
-                st.rerun()
+            if st.session_state.pop("api_key_saved", False):
+                st.success("✅ Chiave API salvata!")
 
             st.divider()
             st.header("💬 Conversazioni")
             
-            # New conversation button
+            # New conversation button (handled before the list and the chat area
+            # are drawn in this same run, so no extra rerun is needed)
             if st.button("➕ Nuova Chat", use_container_width=True, type="primary"):
                 self._create_new_conversation()
-                st.rerun()
 
-            # Load conversations if not loaded
-            if not st.session_state.conversations:
+            # Load conversations once per user; later changes are applied to the
+            # list in place, so an empty list does not mean "reload" on every rerun
+            if st.session_state.conversations_loaded_for != st.session_state.user_id:
                 self._load_conversations()
 
-            # Display conversation list
+            # Display conversation list: one selectbox plus one actions popover,
+            # so the widget count per rerun does not grow with the number of chats
             if st.session_state.conversations:
-                for conv in st.session_state.conversations:
-                    # Check if this conversation is being edited
-                    is_editing = st.session_state.editing_conversation_id == conv.id
-                    
-                    if is_editing:
-                        # Show rename input
-                        col1, col2, col3 = st.columns([3, 1, 1])
-                        with col1:
-                            new_title = st.text_input(
-                                "Rinomina",
-                                value=conv.title,
-                                key=f"rename_input_{conv.id}",
-                                label_visibility="collapsed"
-                            )
-                        with col2:
-                            if st.button("✓", key=f"save_{conv.id}", help="Salva"):
-                                if new_title.strip():
-                                    self._service.rename_conversation(conv.id, new_title.strip())
-                                    conv.title = new_title.strip()
-                                st.session_state.editing_conversation_id = None
-                                st.rerun()
-                        with col3:
-                            if st.button("✗", key=f"cancel_{conv.id}", help="Annulla"):
-                                st.session_state.editing_conversation_id = None
-                                st.rerun()
-                    else:
-                        # Normal view
-                        is_current = conv.id == st.session_state.current_conversation_id
-                        
-                        col1, col2, col3 = st.columns([3, 1, 1])
-                        with col1:
-                            button_kwargs = {
-                                "label": f"{'▶️ ' if is_current else ''}{conv.title}",
-                                "key": f"conv_{conv.id}",
-                                "use_container_width": True,
-                            }
-                            if is_current:
-                                button_kwargs["type"] = "secondary"
-                            
-                            if st.button(**button_kwargs):
-                                self._load_conversation_messages(conv.id)
-                                st.rerun()
-                        
-                        with col2:
-                            if st.button("✏️", key=f"edit_{conv.id}", help="Rinomina conversazione"):
-                                st.session_state.editing_conversation_id = conv.id
-                                st.rerun()
-                        
-                        with col3:
-                            if st.button("🗑️", key=f"del_{conv.id}", help="Elimina conversazione"):
-                                self._service.delete_conversation(conv.id)
-                                st.session_state.conversations.remove(conv)
-                                if conv.id == st.session_state.current_conversation_id:
-                                    st.session_state.current_conversation_id = None
-                                    st.session_state.messages = []
-                                st.rerun()
+                conversations = st.session_state.conversations
+                ids = list(conversations)
+                current_id = st.session_state.current_conversation_id
+                selected_id = st.selectbox(
+                    "Conversazione",
+                    options=ids,
+                    index=ids.index(current_id) if current_id in conversations else None,
+                    format_func=lambda conv_id: conversations[conv_id].title,
+                    placeholder="Seleziona una conversazione",
+                    label_visibility="collapsed",
+                )
+                if selected_id is not None and selected_id != current_id:
+                    self._load_conversation_messages(selected_id)
+                    current_id = selected_id
+
+                if current_id in conversations:
+                    with st.popover("⋯ Gestisci", use_container_width=True):
+                        # Callbacks run before the rerun, so the selectbox above is
+                        # already drawn with the new state
+                        st.text_input(
+                            "Rinomina",
+                            value=conversations[current_id].title,
+                            key=f"rename_input_{current_id}",
+                        )
+                        st.button(
+                            "✓ Salva",
+                            key="rename_conversation",
+                            use_container_width=True,
+                            on_click=self._rename_conversation,
+                            args=(current_id,),
+                        )
+                        st.button(
+                            "🗑️ Elimina",
+                            key="delete_conversation",
+                            use_container_width=True,
+                            on_click=self._delete_conversation,
+                            args=(current_id,),
+                        )
             else:
                 st.info("Nessuna conversazione. Crea la tua prima chat!")
 
@@ -152,62 +270,33 @@ class ChatUI:
         Returns:
             Tuple of (text_content, chart_data_dict or None)
         """
-        # Look for chart data between markers
-        print(f"[DEBUG UI] Checking for chart markers in response (length: {len(content)})")
-        print(f"[DEBUG UI] Has CHART_DATA_START: {'CHART_DATA_START' in content}")
-        print(f"[DEBUG UI] Has CHART_DATA_END: {'CHART_DATA_END' in content}")
-        
-        if "CHART_DATA_START" in content and "CHART_DATA_END" in content:
-            try:
-                start_marker = "CHART_DATA_START"
-                end_marker = "CHART_DATA_END"
-                
-                start_idx = content.find(start_marker) + len(start_marker)
-                end_idx = content.find(end_marker)
-                
-                if start_idx > len(start_marker) and end_idx > start_idx:
-                    json_str = content[start_idx:end_idx].strip()
-                    print(f"[DEBUG UI] Extracted JSON string length: {len(json_str)}")
-                    chart_data = json.loads(json_str)
-                    print(f"[DEBUG UI] Successfully parsed chart JSON! Has chart_json: {'chart_json' in chart_data}")
-                    
-                    if chart_data.get("success") and "chart_json" in chart_data:
-                        # Remove chart data section from text
-                        text_before = content[:content.find(start_marker)].strip()
-                        text_after = content[content.find(end_marker) + len(end_marker):].strip()
-                        text_content = (text_before + " " + text_after).strip()
-                        print(f"[DEBUG UI] Chart extraction successful!")
-                        return text_content, chart_data
-            except (json.JSONDecodeError, ValueError) as e:
-                print(f"[ERROR UI] Error parsing chart data: {e}")
-        
-        # Fallback: try old method (for backward compatibility)
-        if "chart_json" in content.lower() or '"success": true' in content:
-            try:
-                # Try to extract JSON object from text
-                start_idx = content.find('{')
-                end_idx = content.rfind('}')
-                if start_idx != -1 and end_idx != -1:
-                    json_str = content[start_idx:end_idx+1]
-                    chart_data = json.loads(json_str)
-                    if chart_data.get("success") and "chart_json" in chart_data:
-                        # Remove JSON from text
-                        text_before = content[:start_idx].strip()
-                        text_after = content[end_idx+1:].strip()
-                        text_content = (text_before + " " + text_after).strip()
-                        return text_content, chart_data
-            except (json.JSONDecodeError, ValueError):
-                pass
-        
-        return content, None
+        return _parse_chart_response(content)
     
     def _render_messages(self) -> None:
-        """Render all messages in the current conversation."""
-        for message in st.session_state.messages:
+        """Render the messages of the current conversation.
+
+        Only the latest ``MESSAGE_WINDOW`` messages are rendered on each rerun
+        unless the user asks for the older ones, so long conversations do not
+        resend their whole history to the browser on every interaction.
+        """
+        messages = st.session_state.messages
+        hidden = 0 if st.session_state.show_all_messages else max(0, len(messages) - MESSAGE_WINDOW)
+        if hidden:
+            if st.button(f"⬆️ Carica {hidden} messaggi precedenti", key="load_older_messages"):
+                st.session_state.show_all_messages = True
+                st.rerun()
+        # History messages never change, so their chart JSON is decoded once per
+        # session; only the messages rendered this run are kept
+        previous = st.session_state.parsed_responses
+        parsed: Dict[str, tuple[str, Optional[dict]]] = {}
+        for message in messages[hidden:]:
             with st.chat_message(message.role):
                 # Check if message contains chart data
                 if message.role == "assistant":
-                    text_content, chart_data = self._extract_chart_from_response(message.content)
+                    if message.content not in parsed:
+                        cached = previous.get(message.content)
+                        parsed[message.content] = cached or self._extract_chart_from_response(message.content)
+                    text_content, chart_data = parsed[message.content]
                     
                     if chart_data and chart_data.get("success"):
                         # Display text content
@@ -216,9 +305,9 @@ class ChatUI:
                         
                         # Display chart
                         try:
-                            chart_json = chart_data["chart_json"]
-                            fig = go.Figure(json.loads(chart_json))
-                            st.plotly_chart(fig, use_container_width=True)
+                            st.plotly_chart(_chart_figure(chart_data), use_container_width=True)
+                            if "warning" in chart_data:
+                                st.warning(chart_data["warning"])
                             
                             # Show chart info
                             with st.expander("ℹ️ Dettagli grafico"):
@@ -232,11 +321,149 @@ class ChatUI:
                         st.markdown(message.content)
                 else:
                     st.markdown(message.content)
+        st.session_state.parsed_responses = parsed
+
+    @st.fragment
+    def _render_chat(self) -> None:
+        """Render the message list and chat input of the current conversation.
+
+        Runs as a fragment: sending a message reruns only the chat area, not
+        the page header and the sidebar's conversation list.
+        """
+        self._render_messages()
+
+        # Chat input
+        if prompt := st.chat_input("Scrivi un messaggio…"):
+            # Check if API key is provided (warn but continue)
+            if not st.session_state.openai_api_key:
+                st.info("ℹ️ Nessuna API key configurata. Userò risposte demo. Inserisci la chiave OpenAI nelle impostazioni per usare l'agent intelligente.")
+
+            user_id = st.session_state.user_id
+            conversation_id = st.session_state.current_conversation_id
+
+            # Add user message immediately
+            user_msg = self._service.add_user_message(
+                user_id=user_id,
+                conversation_id=conversation_id,
+                content=prompt
+            )
+            st.session_state.messages.append(user_msg)
+            _message_epochs[conversation_id] = _message_epochs.get(conversation_id, 0) + 1
+
+            # Display user message
+            with st.chat_message("user"):
+                st.markdown(user_msg.content)
+
+            # Stream assistant response
+            with st.chat_message("assistant"):
+                # Create container for reasoning steps
+                reasoning_placeholder = st.empty()
+                response_placeholder = st.empty()
+                chart_placeholder = st.empty()
+
+                reasoning_steps = []
+                reasoning_text = "🧠 Processo di ragionamento:"
+                full_response = ""
+                chart_data = None
+                last_flush = 0.0
+                assistant_msg = None
+
+                # Stream from agent
+                for chunk in self._service.stream_reply(
+                    user_id=user_id,
+                    conversation_id=conversation_id,
+                    last_user_message=prompt,
+                    openai_api_key=st.session_state.openai_api_key or None
+                ):
+                    chunk_type = chunk.get("type", "response")
+                    chunk_content = chunk.get("content", "")
+
+                    if chunk_type == "done":
+                        # Reply as persisted by the service
+                        assistant_msg = chunk["message"]
+
+                    elif chunk_type == "reasoning":
+                        step = chunk_content.strip()
+                        # Empty heartbeats and repeats of the last step leave the panel as is
+                        if not step or (reasoning_steps and reasoning_steps[-1] == step):
+                            continue
+                        reasoning_steps.append(step)
+                        # Update reasoning display (extended in place, not re-joined per step)
+                        reasoning_text += f"\n\n{step}"
+                        reasoning_placeholder.code(reasoning_text, language=None)
+
+                    elif chunk_type == "draft":
+                        # Answer tokens as they arrive, redrawn at most once per interval
+                        # (drafts are cumulative, so skipped ones lose nothing) as plain
+                        # text; markdown and chart JSON are rendered once at the end
+                        now = time.monotonic()
+                        if now - last_flush >= STREAM_FLUSH_INTERVAL:
+                            last_flush = now
+                            # Cut at the chart marker without copying the JSON after it
+                            marker_at = chunk_content.find("CHART_DATA_START")
+                            draft = chunk_content if marker_at < 0 else chunk_content[:marker_at]
+                            response_placeholder.text(draft + "▌")
+
+                    elif chunk_type == "response":
+                        # Update final response
+                        full_response = chunk_content
+                        # Show reasoning in collapsed state
+                        if reasoning_steps:
+                            with reasoning_placeholder:
+                                with st.expander("🧠 Processo di ragionamento", expanded=False):
+                                    for step in reasoning_steps:
+                                        st.markdown(step)
+                                        st.divider()
+
+                        # Check if response contains chart data
+                        text_content, extracted_chart = self._extract_chart_from_response(full_response)
+
+                        if extracted_chart and extracted_chart.get("success"):
+                            chart_data = extracted_chart
+                            response_placeholder.text(text_content + "▌")
+                        else:
+                            response_placeholder.text(full_response + "▌")
+
+                # Final update without cursor
+                if full_response:
+                    text_content, extracted_chart = self._extract_chart_from_response(full_response)
+
+                    if extracted_chart and extracted_chart.get("success"):
+                        # Display text without chart JSON
+                        if text_content:
+                            response_placeholder.markdown(text_content)
+
+                        # Display chart
+                        with chart_placeholder:
+                            try:
+                                st.plotly_chart(_chart_figure(extracted_chart), use_container_width=True)
+                                if "warning" in extracted_chart:
+                                    st.warning(extracted_chart["warning"])
+
+                                # Show chart info
+                                with st.expander("ℹ️ Dettagli grafico"):
+                                    st.write(f"**Tipo:** {extracted_chart.get('chart_type', 'N/A')}")
+                                    st.write(f"**Punti dati:** {extracted_chart.get('data_points', 'N/A')}")
+                                    if "sql_executed" in extracted_chart:
+                                        st.code(extracted_chart["sql_executed"], language="sql")
+                            except Exception as e:
+                                st.error(f"Errore nella visualizzazione del grafico: {e}")
+                    else:
+                        response_placeholder.markdown(full_response)
+
+            # The reply is already stored: publish it with a new epoch
+            if assistant_msg is not None:
+                st.session_state.messages.append(assistant_msg)
+                _message_epochs[conversation_id] = _message_epochs.get(conversation_id, 0) + 1
+
+            # Sending only reruns this fragment, never render(): persist the
+            # conversation timestamps here, after the answer is on screen
+            self._flush_writes()
 
     def render(self) -> None:
         """Main render method for the chat UI."""
         self._ensure_session()
-        st.set_page_config(page_title="Tree Evaluator Chat", page_icon="🌳", layout="centered")
+        self._flush_writes()
         st.title("🌳 Tree Evaluator — AI Chat")
         st.caption("Chatbot intelligente con LangChain/LangGraph per analisi alberi e dataset Vienna")
 
@@ -262,111 +489,4 @@ class ChatUI:
                 **Senza chiave API**, il chatbot userà risposte demo di fallback.
                 """)
         else:
-            self._render_messages()
-
-            # Chat input
-            if prompt := st.chat_input("Scrivi un messaggio…"):
-                # Check if API key is provided (warn but continue)
-                if not st.session_state.openai_api_key:
-                    st.info("ℹ️ Nessuna API key configurata. Userò risposte demo. Inserisci la chiave OpenAI nelle impostazioni per usare l'agent intelligente.")
-                
-                user_id = st.session_state.user_id
-                conversation_id = st.session_state.current_conversation_id
-                
-                # Add user message immediately
-                user_msg = self._service.add_user_message(
-                    user_id=user_id,
-                    conversation_id=conversation_id,
-                    content=prompt
-                )
-                st.session_state.messages.append(user_msg)
-                
-                # Display user message
-                with st.chat_message("user"):
-                    st.markdown(user_msg.content)
-                
-                # Stream assistant response
-                with st.chat_message("assistant"):
-                    # Create container for reasoning steps
-                    reasoning_placeholder = st.empty()
-                    response_placeholder = st.empty()
-                    chart_placeholder = st.empty()
-                    
-                    reasoning_steps = []
-                    full_response = ""
-                    chart_data = None
-                    
-                    # Stream from agent
-                    for chunk in self._service.stream_reply(
-                        user_id=user_id,
-                        conversation_id=conversation_id,
-                        last_user_message=prompt,
-                        openai_api_key=st.session_state.openai_api_key or None
-                    ):
-                        chunk_type = chunk.get("type", "response")
-                        chunk_content = chunk.get("content", "")
-                        
-                        if chunk_type == "reasoning":
-                            # Add reasoning step
-                            reasoning_steps.append(chunk_content)
-                            # Update reasoning display
-                            reasoning_text = "\n\n".join(reasoning_steps)
-                            reasoning_placeholder.markdown(f"```\n🧠 Processo di ragionamento:\n\n{reasoning_text}\n```")
-                        
-                        elif chunk_type == "response":
-                            # Update final response
-                            full_response = chunk_content
-                            # Show reasoning in collapsed state
-                            if reasoning_steps:
-                                with reasoning_placeholder:
-                                    with st.expander("🧠 Processo di ragionamento", expanded=False):
-                                        for step in reasoning_steps:
-                                            st.markdown(step)
-                                            st.divider()
-                            
-                            # Check if response contains chart data
-                            text_content, extracted_chart = self._extract_chart_from_response(full_response)
-                            
-                            if extracted_chart and extracted_chart.get("success"):
-                                chart_data = extracted_chart
-                                response_placeholder.markdown(text_content + "▌")
-                            else:
-                                response_placeholder.markdown(full_response + "▌")
-                    
-                    # Final update without cursor
-                    if full_response:
-                        text_content, extracted_chart = self._extract_chart_from_response(full_response)
-                        
-                        if extracted_chart and extracted_chart.get("success"):
-                            # Display text without chart JSON
-                            if text_content:
-                                response_placeholder.markdown(text_content)
-                            
-                            # Display chart
-                            with chart_placeholder:
-                                try:
-                                    chart_json = extracted_chart["chart_json"]
-                                    fig = go.Figure(json.loads(chart_json))
-                                    st.plotly_chart(fig, use_container_width=True)
-                                    
-                                    # Show chart info
-                                    with st.expander("ℹ️ Dettagli grafico"):
-                                        st.write(f"**Tipo:** {extracted_chart.get('chart_type', 'N/A')}")
-                                        st.write(f"**Punti dati:** {extracted_chart.get('data_points', 'N/A')}")
-                                        if "sql_executed" in extracted_chart:
-                                            st.code(extracted_chart["sql_executed"], language="sql")
-                                except Exception as e:
-                                    st.error(f"Errore nella visualizzazione del grafico: {e}")
-                        else:
-                            response_placeholder.markdown(full_response)
-                
-                # Add assistant message to session state
-                # (already persisted by stream_reply, just update UI state)
-                from streamlit_app.models import ChatMessage
-                assistant_msg = ChatMessage.new(
-                    user_id=user_id,
-                    conversation_id=conversation_id,
-                    role="assistant",
-                    content=full_response
-                )
-                st.session_state.messages.append(assistant_msg)
+            self._render_chat()
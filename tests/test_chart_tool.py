@@ -57,14 +57,14 @@ class TestChartToolBarChart:
         )
         
         assert result["success"] is True
-        assert "chart_json" in result
+        assert "chart" in result
         assert result["chart_type"] == "bar"
         assert result["data_points"] > 0
         
-        # Verify chart JSON is valid
-        chart_json = json.loads(result["chart_json"])
-        assert "data" in chart_json
-        assert "layout" in chart_json
+        # Verify the chart is a JSON-serializable Plotly figure
+        chart = json.loads(json.dumps(result["chart"]))
+        assert "data" in chart
+        assert "layout" in chart
     
     def test_bar_chart_top_species(self, chart_tool: ChartGenerationTool) -> None:
         """Test bar chart of top species."""
@@ -89,7 +89,7 @@ class TestChartToolPieChart:
         )
         
         assert result["success"] is True
-        assert "chart_json" in result
+        assert "chart" in result
         assert result["chart_type"] == "pie"
 
 
@@ -106,8 +106,9 @@ class TestChartToolHistogram:
         assert result["success"] is True
         assert result["chart_type"] == "histogram"
         
-        # Histogram should have many data points
-        assert result["data_points"] > 100
+        # Histogram is binned in SQL: one data point per age bucket
+        assert result["data_points"] > 1
+        assert "group by" in result["sql_executed"].lower()
 
 
 class TestChartToolLineChart:
@@ -180,9 +181,8 @@ class TestChartToolCustomization:
         
         assert result["success"] is True
         
-        # Verify labels are in chart JSON
-        chart_json = json.loads(result["chart_json"])
-        layout = chart_json.get("layout", {})
+        # Verify labels are in the chart figure
+        layout = result["chart"].get("layout", {})
         assert "xaxis" in layout or "yaxis" in layout
 
 
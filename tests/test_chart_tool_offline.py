@@ -0,0 +1,375 @@
+"""
+Offline tests for Chart Generation Tool (no OpenAI key required).
+
+Run with: pytest tests/test_chart_tool_offline.py -v
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from streamlit_app.tools.chart_tool import ChartGenerationTool
+
+DB_PATH = Path(__file__).parent.parent / "dataset" / "BAUMKATOGD.db"
+
+
+class FakeLLM:
+    """Minimal stand-in for a chat model returning a fixed chart spec."""
+
+    def __init__(self, spec: dict) -> None:
+        self.spec = spec
+        self.calls = 0
+        self.last_prompt: Any = None
+
+    def invoke(self, prompt: Any) -> Any:
+        self.calls += 1
+        self.last_prompt = prompt
+
+        class _Response:
+            content = json.dumps(self.spec)
+
+        return _Response()
+
+
+BAR_SPEC = {
+    "sql": "SELECT district, COUNT(*) as count FROM baumkatogd WHERE district IS NOT NULL GROUP BY district ORDER BY district",
+    "x_column": "district",
+    "y_column": "count",
+    "suggested_title": "Numero di Alberi per Distretto",
+    "x_label": "Distretto",
+    "y_label": "Numero di Alberi",
+}
+
+
+def test_translation_is_cached_per_normalized_query() -> None:
+    llm = FakeLLM(BAR_SPEC)
+    tool = ChartGenerationTool(db_path=DB_PATH, llm=llm)
+
+    first = tool._translate_to_chart_sql("Numero di alberi per distretto", "bar")
+    second = tool._translate_to_chart_sql("  numero di alberi per DISTRETTO ", "bar")
+    tool._translate_to_chart_sql("Numero di alberi per distretto", "pie")
+
+    assert first == second == BAR_SPEC
+    assert llm.calls == 2
+
+
+def test_minmax_downsample_bounds_points_and_keeps_extremes() -> None:
+    from streamlit_app.tools.chart_tool import MAX_PLOT_POINTS, _minmax_downsample
+
+    x = list(range(100_000))
+    y = [float(i % 997) for i in x]
+    y[54_321] = 1e6
+
+    x_out, y_out = _minmax_downsample(x, y)
+
+    assert len(x_out) <= MAX_PLOT_POINTS
+    assert max(y_out) == 1e6
+    assert list(x_out) == sorted(x_out)
+
+
+def test_minmax_downsample_leaves_small_series_untouched() -> None:
+    from streamlit_app.tools.chart_tool import _minmax_downsample
+
+    x, y = [1, 2, 3], [3.0, 1.0, 2.0]
+    assert _minmax_downsample(x, y) == (x, y)
+
+
+def test_large_scatter_uses_webgl_trace() -> None:
+    tool = ChartGenerationTool(db_path=DB_PATH, llm=FakeLLM(BAR_SPEC))
+    data = {"x": [float(i) for i in range(10_000)], "y": [float(i % 50) for i in range(10_000)]}
+
+    fig = tool._create_chart("scatter", data, "x", "y", "t", "x", "y")
+
+    assert fig.data[0].type == "scattergl"
+    assert len(fig.data[0].x) <= 2000
+
+
+def test_box_plot_has_one_trace_per_category_in_first_seen_order() -> None:
+    tool = ChartGenerationTool(db_path=DB_PATH, llm=FakeLLM(BAR_SPEC))
+    data = {"species": ("Tilia", "Acer", "Tilia"), "dbh": (30.0, 20.0, 40.0)}
+
+    fig = tool._create_chart("box", data, "species", "dbh", "t", "x", "y")
+
+    assert [trace.name for trace in fig.data] == ["Tilia", "Acer"]
+    assert list(fig.data[0].y) == [30.0, 40.0]
+
+
+def test_run_builds_chart_from_columnar_results() -> None:
+    if not DB_PATH.exists():
+        pytest.skip(f"Database not found at {DB_PATH}")
+    tool = ChartGenerationTool(db_path=DB_PATH, llm=FakeLLM(BAR_SPEC))
+
+    result = tool._run(chart_type="bar", data_query="Numero di alberi per distretto")
+
+    assert result["success"] is True
+    assert result["data_points"] == 23
+    chart = json.loads(json.dumps(result["chart"]))
+    assert len(chart["data"][0]["x"]) == 23
+
+
+def test_connection_is_reused_and_read_only() -> None:
+    if not DB_PATH.exists():
+        pytest.skip(f"Database not found at {DB_PATH}")
+    tool = ChartGenerationTool(db_path=DB_PATH, llm=FakeLLM(BAR_SPEC))
+
+    conn = tool._get_connection()
+
+    assert tool._get_connection() is conn
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("CREATE TABLE should_fail (id INTEGER)")
+
+
+def test_concurrent_first_use_opens_one_connection_and_shares_translations() -> None:
+    from concurrent.futures import ThreadPoolExecutor
+
+    if not DB_PATH.exists():
+        pytest.skip(f"Database not found at {DB_PATH}")
+    tool = ChartGenerationTool(db_path=DB_PATH, llm=FakeLLM(BAR_SPEC))
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        connections = list(executor.map(lambda _: tool._get_connection(), range(32)))
+        specs = list(
+            executor.map(lambda i: tool._translate_to_chart_sql(f"query {i % 4}", "bar"), range(32))
+        )
+
+    assert len({id(conn) for conn in connections}) == 1
+    assert all(spec["sql"] == BAR_SPEC["sql"] for spec in specs)
+    assert len(tool._translation_cache) == 4
+
+
+def test_query_results_are_cached_per_sql() -> None:
+    if not DB_PATH.exists():
+        pytest.skip(f"Database not found at {DB_PATH}")
+    tool = ChartGenerationTool(db_path=DB_PATH, llm=FakeLLM(BAR_SPEC))
+    conn = tool._get_connection()
+
+    data, _ = tool._execute_query(conn, BAR_SPEC["sql"])
+    cached, _ = tool._execute_query(conn, BAR_SPEC["sql"])
+
+    assert list(cached) == ["district", "count"]
+    assert cached["district"] is data["district"]
+    assert isinstance(data["count"], tuple)
+    assert len(data["count"]) == 23
+    assert len(tool._result_cache) == 1
+
+
+def test_box_uses_precomputed_summary_columns() -> None:
+    tool = ChartGenerationTool(llm=FakeLLM(BAR_SPEC))
+    data = {
+        "species": ("Tilia", "Acer"),
+        "min_value": (1.0, 2.0),
+        "q1": (2.0, 3.0),
+        "median": (3.0, 4.0),
+        "q3": (4.0, 5.0),
+        "max_value": (5.0, 6.0),
+    }
+
+    fig = tool._create_chart("box", data, "species", "median", "t", "x", "y")
+
+    assert len(fig.data) == 1
+    box = fig.data[0]
+    assert list(box.x) == ["Tilia", "Acer"]
+    assert list(box.median) == [3.0, 4.0]
+    assert list(box.upperfence) == [5.0, 6.0]
+
+
+def test_prompt_uses_generated_dbh_column_when_present(tmp_path: Path) -> None:
+    db_path = tmp_path / "trees.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE baumkatogd (trunk_circumference INTEGER, "
+        "dbh_cm REAL GENERATED ALWAYS AS (trunk_circumference / 3.141592653589793) VIRTUAL)"
+    )
+    conn.close()
+    llm = FakeLLM(BAR_SPEC)
+    tool = ChartGenerationTool(db_path=db_path, llm=llm)
+
+    tool._translate_to_chart_sql("DBH medio", "bar")
+
+    system_prompt = llm.last_prompt[0].content
+    assert "DBH (cm) = dbh_cm" in system_prompt
+    assert "trunk_circumference / 3.14" not in system_prompt
+
+
+def test_older_databases_get_the_dbh_formula_shared_with_the_dataset_tool() -> None:
+    from streamlit_app.tools.chart_tool import _static_prompt
+    from streamlit_app.tools.dataset_tool import _static_prompt as dataset_prompt
+    from streamlit_app.tools.sqlite_connection import DBH_FALLBACK
+
+    assert DBH_FALLBACK in _static_prompt(2025, has_dbh_column=False)
+    assert DBH_FALLBACK in dataset_prompt("CREATE TABLE baumkatogd (trunk_circumference INTEGER)", 2025)
+    assert "3.141592653589793" not in _static_prompt(2025, has_dbh_column=False)
+
+
+def test_execute_query_reads_results_across_fetch_chunks(monkeypatch: pytest.MonkeyPatch) -> None:
+    if not DB_PATH.exists():
+        pytest.skip(f"Database not found at {DB_PATH}")
+    monkeypatch.setattr("streamlit_app.tools.chart_tool.FETCH_CHUNK_SIZE", 7)
+    tool = ChartGenerationTool(db_path=DB_PATH, llm=FakeLLM(BAR_SPEC))
+
+    data, _ = tool._execute_query(tool._get_connection(), BAR_SPEC["sql"])
+
+    assert data["district"] == tuple(range(1, 24))
+
+
+@pytest.mark.parametrize("chart_type", ["line", "scatter", "box"])
+def test_chart_dict_is_json_serializable(chart_type: str) -> None:
+    tool = ChartGenerationTool(llm=FakeLLM(BAR_SPEC))
+    data = {"x": tuple(float(i % 40) for i in range(5_000)), "y": tuple(float(i) for i in range(5_000))}
+
+    fig = tool._create_chart(chart_type, data, "x", "y", "t", "x", "y")
+
+    json.dumps(fig.to_dict())
+
+
+@pytest.mark.parametrize(
+    "answer",
+    [
+        json.dumps(BAR_SPEC),
+        "```json\n" + json.dumps(BAR_SPEC) + "\n```",
+        "```\n" + json.dumps(BAR_SPEC) + "\n```",
+        "Ecco la query:\n```json\n" + json.dumps(BAR_SPEC) + "\n```\n",
+    ],
+)
+def test_chart_spec_is_parsed_with_or_without_code_fence(answer: str) -> None:
+    class _FencedLLM:
+        def invoke(self, prompt: Any) -> Any:
+            class _Response:
+                content = answer
+
+            return _Response()
+
+    tool = ChartGenerationTool(llm=_FencedLLM())
+
+    assert tool._request_chart_sql("Numero di alberi per distretto", "bar") == BAR_SPEC
+
+
+def test_static_prompt_is_rendered_once_per_year() -> None:
+    from streamlit_app.tools.chart_tool import _static_prompt
+
+    assert _static_prompt(2030, False) is _static_prompt(2030, False)
+    assert "Current year is 2031" in _static_prompt(2031, False)
+
+
+def test_structured_output_is_used_when_llm_supports_it() -> None:
+    from streamlit_app.tools.chart_tool import ChartSQLSpec
+
+    class _StructuredLLM(FakeLLM):
+        def with_structured_output(self, schema: Any) -> Any:
+            llm = self
+
+            class _Runnable:
+                def invoke(self, prompt: Any) -> Any:
+                    llm.calls += 1
+                    return schema(**llm.spec)
+
+            assert schema is ChartSQLSpec
+            return _Runnable()
+
+        def invoke(self, prompt: Any) -> Any:
+            raise AssertionError("plain-text path should not be used")
+
+    llm = _StructuredLLM(BAR_SPEC)
+    tool = ChartGenerationTool(llm=llm)
+
+    assert tool._request_chart_sql("Numero di alberi per distretto", "bar") == BAR_SPEC
+    assert llm.calls == 1
+
+
+def test_model_without_tool_binding_falls_back_to_text_parsing() -> None:
+    from langchain_core.language_models import FakeListChatModel
+
+    llm = FakeListChatModel(responses=["```json\n" + json.dumps(BAR_SPEC) + "\n```"])
+    tool = ChartGenerationTool(llm=llm)
+
+    assert tool._structured_llm is None
+    assert tool._request_chart_sql("Numero di alberi per distretto", "bar") == BAR_SPEC
+
+
+def test_failed_structured_call_falls_back_to_text_parsing() -> None:
+    class _BrokenStructuredLLM(FakeLLM):
+        def with_structured_output(self, schema: Any) -> Any:
+            class _Runnable:
+                def invoke(self, prompt: Any) -> Any:
+                    raise ValueError("invalid tool call")
+
+            return _Runnable()
+
+    llm = _BrokenStructuredLLM(BAR_SPEC)
+    tool = ChartGenerationTool(llm=llm)
+
+    assert tool._request_chart_sql("Numero di alberi per distretto", "bar") == BAR_SPEC
+    assert llm.calls == 1
+
+
+def _db_tool() -> ChartGenerationTool:
+    if not DB_PATH.exists():
+        pytest.skip(f"Database not found at {DB_PATH}")
+    return ChartGenerationTool(db_path=DB_PATH, llm=FakeLLM(BAR_SPEC))
+
+
+def test_cross_join_is_rejected_before_execution() -> None:
+    tool = _db_tool()
+
+    with pytest.raises(ValueError, match="rifiutata"):
+        tool._execute_query(
+            tool._get_connection(), "SELECT a.district FROM baumkatogd a, baumkatogd b"
+        )
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "DELETE FROM baumkatogd",
+        "SELECT district FROM baumkatogd; DROP TABLE baumkatogd",
+    ],
+)
+def test_non_select_sql_is_rejected_before_execution(sql: str) -> None:
+    tool = _db_tool()
+
+    with pytest.raises(ValueError, match="rifiutata"):
+        tool._execute_query(tool._get_connection(), sql)
+
+
+def test_result_rows_are_capped(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("streamlit_app.tools.chart_tool.MAX_RESULT_ROWS", 1_000)
+    tool = _db_tool()
+
+    data, truncated = tool._execute_query(tool._get_connection(), "SELECT objectid FROM baumkatogd")
+    exact, exact_truncated = tool._execute_query(
+        tool._get_connection(), "SELECT objectid FROM baumkatogd LIMIT 1000"
+    )
+
+    assert len(data["objectid"]) == 1_000
+    assert truncated is True
+    assert len(exact["objectid"]) == 1_000
+    assert exact_truncated is False
+
+
+def test_truncated_results_are_flagged_next_to_the_chart(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("streamlit_app.tools.chart_tool.MAX_RESULT_ROWS", 2)
+    tool = _db_tool()
+
+    result = tool._run(chart_type="bar", data_query="alberi per distretto")
+
+    assert result["success"] is True
+    assert result["data_points"] == 2
+    assert result["truncated"] is True
+    assert "2" in result["warning"]
+
+
+def test_slow_query_is_interrupted(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("streamlit_app.tools.chart_tool.QUERY_TIMEOUT_S", 0.0)
+    tool = _db_tool()
+    conn = tool._get_connection()
+
+    with pytest.raises(ValueError, match="interrotta"):
+        tool._execute_query(conn, "SELECT tree_height, COUNT(*) FROM baumkatogd GROUP BY tree_height")
+
+    # The handler is removed afterwards, so the connection keeps working
+    assert conn.execute("SELECT COUNT(*) FROM baumkatogd").fetchone()[0] > 0
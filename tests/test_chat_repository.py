@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from streamlit_app.models import ChatMessage, Conversation
+from streamlit_app.repository import ChatRepository
+
+
+def _repository_with_conversation(tmp_path: Path) -> tuple[ChatRepository, int]:
+    repository = ChatRepository(db_path=tmp_path / "chat.db")
+    conversation_id = repository.create_conversation(Conversation.new(user_id="guest", title="Test"))
+    return repository, conversation_id
+
+
+def test_add_message_defers_conversation_timestamp_until_flush(tmp_path: Path) -> None:
+    repository, conversation_id = _repository_with_conversation(tmp_path)
+    other_id = repository.create_conversation(Conversation.new(user_id="guest", title="Other"))
+    before = repository.get_conversation(conversation_id).updated_at
+
+    repository.add_message(ChatMessage.new("guest", conversation_id, "user", "hi"))
+    repository.add_message(ChatMessage.new("guest", other_id, "user", "hello"))
+    assert repository.get_conversation(conversation_id).updated_at == before
+
+    repository.flush()
+    assert repository.get_conversation(conversation_id).updated_at > before
+    assert repository.get_conversation(other_id).updated_at > before
+
+
+def test_pending_timestamps_are_flushed_at_exit(tmp_path: Path) -> None:
+    import gc
+
+    from streamlit_app.repository import _LIVE_REPOSITORIES, _flush_at_exit
+
+    repository, conversation_id = _repository_with_conversation(tmp_path)
+    before = repository.get_conversation(conversation_id).updated_at
+    repository.add_message(ChatMessage.new("guest", conversation_id, "user", "hi"))
+
+    _flush_at_exit()
+
+    assert repository.get_conversation(conversation_id).updated_at > before
+    assert repository in _LIVE_REPOSITORIES
+    del repository
+    gc.collect()
+    assert not any(r._db_path == tmp_path / "chat.db" for r in _LIVE_REPOSITORIES)
+
+
+def test_legacy_text_roles_are_migrated(tmp_path: Path) -> None:
+    import sqlite3
+
+    db_path = tmp_path / "legacy.db"
+    with sqlite3.connect(db_path) as connection:
+        connection.executescript(
+            """
+            CREATE TABLE conversations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                title TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            );
+            CREATE TABLE messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                conversation_id INTEGER NOT NULL,
+                role TEXT NOT NULL CHECK(role IN ('user', 'assistant')),
+                content TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            );
+            INSERT INTO conversations VALUES (1, 'guest', 'Old', '2024-01-01T00:00:00+00:00', '2024-01-01T00:00:00+00:00');
+            INSERT INTO messages VALUES (1, 'guest', 1, 'user', 'q', '2024-01-01T00:00:01+00:00');
+            INSERT INTO messages VALUES (2, 'guest', 1, 'assistant', 'a', '2024-01-01T00:00:02+00:00');
+            """
+        )
+
+    repository = ChatRepository(db_path=db_path)
+    messages = repository.list_messages_by_conversation(1)
+
+    assert [(m.role, m.content) for m in messages] == [("user", "q"), ("assistant", "a")]
+
+
+def test_iter_role_content_streams_agent_history_in_order(tmp_path: Path) -> None:
+    repository, conversation_id = _repository_with_conversation(tmp_path)
+    for i in range(150):
+        role = "user" if i % 2 == 0 else "assistant"
+        repository.add_message(ChatMessage.new("guest", conversation_id, role, f"message {i}"))
+
+    history = repository.iter_role_content_by_conversation(conversation_id)
+
+    assert not isinstance(history, list)
+    streamed = list(history)
+    assert len(streamed) == 150
+    assert streamed[:2] == [
+        {"role": "user", "content": "message 0"},
+        {"role": "assistant", "content": "message 1"},
+    ]
+    assert [m["content"] for m in streamed] == [
+        m.content for m in repository.list_messages_by_conversation(conversation_id)
+    ]
+
+
+def test_stream_reply_hands_back_the_persisted_message(tmp_path: Path) -> None:
+    from streamlit_app.service import ChatService
+
+    repository, conversation_id = _repository_with_conversation(tmp_path)
+    service = ChatService(repository)
+
+    chunks = list(service.stream_reply("guest", conversation_id, "ciao"))
+
+    assert [c["type"] for c in chunks] == ["response", "done"]
+    reply = chunks[-1]["message"]
+    assert reply.content == chunks[0]["content"]
+    assert [m.content for m in service.get_conversation_messages(conversation_id)] == [reply.content]
+
+
+def test_agent_is_reused_per_api_key(tmp_path: Path, monkeypatch) -> None:
+    import streamlit_app.agent
+    from streamlit_app.service import ChatService
+
+    class FakeAgent:
+        def __init__(self, openai_api_key: str) -> None:
+            self.key = openai_api_key
+
+    monkeypatch.setattr(streamlit_app.agent, "TreeEvaluatorAgent", FakeAgent)
+    service = ChatService(ChatRepository(db_path=tmp_path / "chat.db"))
+
+    first = service._get_or_create_agent("sk-a")
+
+    assert service._get_or_create_agent("sk-a") is first
+    assert service._get_or_create_agent("sk-b").key == "sk-b"
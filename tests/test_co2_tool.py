@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from app.models.co2 import CO2CalculationRequest
+from app.services.co2_service import CO2CalculationService
+from streamlit_app.tools.co2_tool import CO2BatchCalculationTool, CO2CalculationTool, _cached_co2
+
+
+def test_calculate_batch_matches_single_tree_calculation() -> None:
+    service = CO2CalculationService()
+    dbh = [12.0, 30.0, 55.5]
+    height = [6.0, 15.0, 22.0]
+    density = [0.49, 0.6, 0.75]
+
+    batch = service.calculate_batch(dbh, height, wood_density_g_cm3=density)
+
+    for i in range(len(dbh)):
+        single = service.calculate(
+            CO2CalculationRequest(dbh_cm=dbh[i], height_m=height[i], wood_density_g_cm3=density[i])
+        )
+        assert batch["co2_stock_t"][i] == pytest.approx(single.co2_stock_t, abs=1e-6)
+        assert batch["agb_t"][i] == pytest.approx(single.agb_t, abs=1e-6)
+
+
+def test_calculate_batch_rejects_mismatched_or_non_positive_inputs() -> None:
+    service = CO2CalculationService()
+
+    with pytest.raises(ValueError):
+        service.calculate_batch([10.0, 20.0], [5.0])
+    with pytest.raises(ValueError):
+        service.calculate_batch([10.0, 0.0], [5.0, 6.0])
+
+
+@pytest.mark.parametrize(
+    "kwargs, message",
+    [
+        ({"carbon_fraction": 1.5}, "carbon_fraction"),
+        ({"carbon_fraction": 0.0}, "carbon_fraction"),
+        ({"root_shoot_ratio": -0.2}, "root_shoot_ratio"),
+        ({"wood_density_g_cm3": [0.5, 0.6, 0.7]}, "one value per tree"),
+    ],
+)
+def test_calculate_batch_enforces_single_tree_bounds(kwargs: dict, message: str) -> None:
+    service = CO2CalculationService()
+
+    with pytest.raises(ValueError, match=message):
+        service.calculate_batch([10.0, 20.0], [5.0, 6.0], **kwargs)
+
+
+def test_batch_tool_returns_totals_and_per_tree_values() -> None:
+    tool = CO2BatchCalculationTool()
+
+    result = tool._run(dbh_cm=[20.0, 40.0], height_m=[10.0, 18.0])
+
+    assert result["tree_count"] == 2
+    assert len(result["co2_stock_t_per_tree"]) == 2
+    assert result["co2_stock_t"] == pytest.approx(float(np.sum(result["co2_stock_t_per_tree"])), abs=1e-5)
+
+
+def test_single_tree_tool_caches_results_on_rounded_inputs() -> None:
+    _cached_co2.cache_clear()
+    tool = CO2CalculationTool()
+
+    first = tool._run(dbh_cm=30.0, height_m=15.0)
+    first["agb_t"] = -1.0  # callers get a copy, not the cached dict
+    second = tool._run(dbh_cm=30.00001, height_m=15.0)
+
+    assert second["agb_t"] > 0
+    assert _cached_co2.cache_info().hits == 1
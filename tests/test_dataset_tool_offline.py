@@ -0,0 +1,714 @@
+"""
+Offline tests for Dataset Query Tool (no OpenAI key required).
+
+Run with: pytest tests/test_dataset_tool_offline.py -v
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, List
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from streamlit_app.tools.dataset_tool import DatasetQueryTool, SemanticSQLCache
+
+DB_PATH = Path(__file__).parent.parent / "dataset" / "BAUMKATOGD.db"
+
+COUNT_SQL = "SELECT COUNT(*) as total FROM baumkatogd WHERE district = 19"
+
+
+class FakeLLM:
+    """Minimal stand-in for a chat model returning a fixed SQL answer."""
+
+    def __init__(self, sql: str) -> None:
+        self.sql = sql
+        self.calls = 0
+
+    def invoke(self, prompt: Any) -> Any:
+        self.calls += 1
+        self.last_prompt = prompt
+
+        class _Response:
+            content = self.sql
+
+        return _Response()
+
+    async def ainvoke(self, prompt: Any) -> Any:
+        return self.invoke(prompt)
+
+
+class KeywordEmbeddings(Embeddings):
+    """Embeds text as a bag of known keywords, so paraphrases look alike."""
+
+    KEYWORDS = ("alberi", "distretto", "specie", "età")
+
+    def _embed(self, text: str) -> List[float]:
+        lowered = text.lower()
+        return [float(word in lowered) for word in self.KEYWORDS] + [0.1]
+
+    def __init__(self) -> None:
+        self.document_batches = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.document_batches += 1
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def _tool(llm: FakeLLM, embeddings: Embeddings | None = None) -> DatasetQueryTool:
+    tool = DatasetQueryTool(db_path=DB_PATH, llm=llm)
+    if embeddings is not None:
+        object.__setattr__(tool, "_semantic_cache", SemanticSQLCache(embeddings))
+    return tool
+
+
+def test_exact_repeat_skips_llm() -> None:
+    llm = FakeLLM(COUNT_SQL)
+    tool = _tool(llm)
+
+    first = tool._translate_to_sql("Quanti alberi di Acer nel distretto 19?", "schema")
+    second = tool._translate_to_sql("  quanti ALBERI di acer nel distretto 19? ", "schema")
+
+    assert first == second == COUNT_SQL
+    assert llm.calls == 1
+
+
+def test_paraphrase_hits_semantic_cache() -> None:
+    llm = FakeLLM(COUNT_SQL)
+    tool = _tool(llm, KeywordEmbeddings())
+
+    tool._translate_to_sql("Quanti alberi di Acer nel distretto 19?", "schema")
+    sql = tool._translate_to_sql("alberi acer distretto 19", "schema")
+
+    assert sql == COUNT_SQL
+    assert llm.calls == 1
+
+
+def test_semantic_cache_requires_same_numbers() -> None:
+    llm = FakeLLM(COUNT_SQL)
+    tool = _tool(llm, KeywordEmbeddings())
+
+    tool._translate_to_sql("Quanti alberi di Acer nel distretto 19?", "schema")
+    tool._translate_to_sql("Quanti alberi di Acer nel distretto 10?", "schema")
+
+    assert llm.calls == 2
+
+
+def test_semantic_cache_stores_half_precision_matrix() -> None:
+    import numpy as np
+
+    cache = SemanticSQLCache(KeywordEmbeddings())
+    for question in ("alberi nel distretto 1", "specie con età 2"):
+        _, vector = cache.lookup(question)
+        cache.add(question, vector, COUNT_SQL)
+
+    assert cache._matrix.dtype == np.float16
+    assert cache._matrix.shape[0] == 2
+    assert cache.lookup("specie con età 2")[0] == COUNT_SQL
+
+
+def test_prompt_is_rendered_once_and_schema_read_once() -> None:
+    from streamlit_app.tools.dataset_tool import _static_prompt
+
+    if not DB_PATH.exists():
+        pytest.skip(f"Database not found at {DB_PATH}")
+    tool = _tool(FakeLLM(COUNT_SQL))
+
+    schema = tool._get_schema_info()
+
+    assert "CREATE TABLE" in schema
+    assert tool._get_schema_info() is schema
+    assert _static_prompt(schema, 2030) is _static_prompt(schema, 2030)
+
+
+def test_pooled_connections_are_reused_and_read_only() -> None:
+    import sqlite3
+
+    if not DB_PATH.exists():
+        pytest.skip(f"Database not found at {DB_PATH}")
+    tool = _tool(FakeLLM(COUNT_SQL))
+
+    pool = tool._get_pool()
+    with pool.connection() as first:
+        with pytest.raises(sqlite3.DatabaseError, match="not authorized"):
+            first.execute("DELETE FROM baumkatogd")
+    with pool.connection() as second:
+        assert second is first
+    assert tool._get_pool() is pool
+
+
+def test_pool_runs_queries_in_parallel_up_to_its_size(tmp_path: Path) -> None:
+    import sqlite3
+    import threading
+
+    from streamlit_app.tools.sqlite_connection import ReadOnlyConnectionPool
+
+    db_path = tmp_path / "trees.db"
+    sqlite3.connect(db_path).close()
+    pool = ReadOnlyConnectionPool(db_path, size=2)
+    barrier = threading.Barrier(2, timeout=5)
+    seen = []
+
+    def worker() -> None:
+        with pool.connection() as conn:
+            seen.append(conn)
+            barrier.wait()
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(conn) for conn in seen}) == 2
+    assert pool._opened == 2
+
+
+def test_small_result_sets_are_returned_as_row_dicts() -> None:
+    if not DB_PATH.exists():
+        pytest.skip(f"Database not found at {DB_PATH}")
+    sql = "SELECT district, COUNT(*) as count FROM baumkatogd WHERE district IS NOT NULL GROUP BY district ORDER BY district LIMIT 3"
+    tool = _tool(FakeLLM(sql))
+
+    result = tool._run("Alberi per distretto")
+
+    assert result["columns"] == ["district", "count"]
+    assert [row["district"] for row in result["results"]] == [1, 2, 3]
+    assert all(set(row) == {"district", "count"} for row in result["results"])
+
+
+def test_semantic_filter_embeds_rows_in_one_batch_and_ranks_by_similarity() -> None:
+    embeddings = KeywordEmbeddings()
+    tool = _tool(FakeLLM(COUNT_SQL))
+    object.__setattr__(tool, "_embeddings", embeddings)
+    columns = ["label"]
+    rows = [("parco",)] * 10 + [("specie rara",), ("distretto centrale",)]
+
+    results = tool._semantic_filter_results(rows, columns, "specie", top_k=2)
+
+    assert embeddings.document_batches == 1
+    assert results[0] == {"label": "specie rara"}
+    assert len(results) == 2
+
+
+def test_rows_are_packed_into_token_bounded_batches_in_order() -> None:
+    from streamlit_app.tools.dataset_tool import _embed_in_token_batches, _pack_by_tokens
+
+    texts = [f"row {i} " + "x" * 400 for i in range(300)]
+
+    batches = _pack_by_tokens(texts, max_tokens=8000)
+
+    assert len(batches) > 1
+    assert [text for batch in batches for text in batch] == texts
+    assert all(sum(len(t) // 4 + 1 for t in batch) <= 8000 for batch in batches)
+
+    embeddings = KeywordEmbeddings()
+    vectors = _embed_in_token_batches(embeddings, texts)
+    assert len(vectors) == len(texts)
+    assert embeddings.document_batches == len(_pack_by_tokens(texts))
+
+
+def test_full_text_results_skip_embeddings(tmp_path: Path) -> None:
+    import sqlite3
+
+    db_path = tmp_path / "trees.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE baumkatogd (objectid INTEGER, genus_species TEXT, object_street TEXT)")
+    conn.executemany(
+        "INSERT INTO baumkatogd VALUES (?, ?, ?)",
+        [(i, "Acer platanoides", f"Ring {i}") for i in range(150)],
+    )
+    conn.execute(
+        "CREATE VIRTUAL TABLE baumkatogd_fts USING fts5(genus_species, object_street, content='baumkatogd')"
+    )
+    conn.execute("INSERT INTO baumkatogd_fts(baumkatogd_fts) VALUES('rebuild')")
+    conn.commit()
+    conn.close()
+    sql = (
+        "SELECT objectid, genus_species FROM baumkatogd WHERE rowid IN "
+        "(SELECT rowid FROM baumkatogd_fts WHERE baumkatogd_fts MATCH 'genus_species:acer*')"
+    )
+    llm = FakeLLM(sql)
+    tool = DatasetQueryTool(db_path=db_path, llm=llm)
+
+    class _NoEmbeddings:
+        def embed_documents(self, texts: List[str]) -> List[List[float]]:
+            raise AssertionError("full-text results must not be embedded")
+
+    object.__setattr__(tool, "_embeddings", _NoEmbeddings())
+
+    result = tool._run("Mostra gli aceri")
+
+    assert result["total_rows_found"] == 150
+    assert result["row_count"] == 50
+    assert tool._has_fts_index() is True
+    assert "baumkatogd_fts MATCH" in _prompt_text(tool)
+    assert "LIKE '%Acer%'" not in _prompt_text(tool)
+
+
+def test_prompt_fts_filter_finds_the_same_species_as_like() -> None:
+    import sqlite3
+
+    from streamlit_app.tools.dataset_tool import _FTS_ACER_FILTER, _LIKE_ACER_FILTER
+
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE baumkatogd (genus_species TEXT, object_street TEXT)")
+    conn.executemany(
+        "INSERT INTO baumkatogd VALUES (?, 'Ring')",
+        [
+            ("Acer platanoides (Spitzahorn)",),
+            ("Acer campestre 'Elsrijk' (Feldahorn)",),
+            ("Platanus x acerifolia (Ahornblättrige Platane)",),
+            ("Tilia cordata (Winterlinde)",),
+            ("Carpinus betulus (Hainbuche)",),
+        ],
+    )
+    conn.execute(
+        "CREATE VIRTUAL TABLE baumkatogd_fts USING fts5(genus_species, object_street, content='baumkatogd')"
+    )
+    conn.execute("INSERT INTO baumkatogd_fts(baumkatogd_fts) VALUES('rebuild')")
+
+    def count(where: str) -> int:
+        return conn.execute(f"SELECT COUNT(*) FROM baumkatogd WHERE {where}").fetchone()[0]
+
+    assert count(_FTS_ACER_FILTER) == count(_LIKE_ACER_FILTER) == 3
+
+
+def test_prompt_without_fts_index_searches_species_with_like() -> None:
+    from streamlit_app.tools.dataset_tool import _static_prompt
+
+    prompt = _static_prompt("CREATE TABLE baumkatogd (genus_species TEXT)", 2025)
+
+    assert "genus_species LIKE '%Acer%'" in prompt
+    assert "MATCH" not in prompt
+
+
+def _prompt_text(tool: DatasetQueryTool) -> str:
+    from datetime import date
+
+    from streamlit_app.tools.dataset_tool import _static_prompt
+
+    return _static_prompt(tool._get_schema_info(), date.today().year, tool._has_fts_index())
+
+
+@pytest.mark.parametrize(
+    "question, expected",
+    [
+        ("Quanti alberi ci sono?", "SELECT COUNT(*) as total FROM baumkatogd"),
+        ("Quanti alberi nel distretto 19?", "WHERE district = 19"),
+        ("quanti alberi ci sono nel distretto 7", "WHERE district = 7"),
+        ("Top 5 specie", "LIMIT 5"),
+        ("Età media alberi distretto 10", "WHERE district = 10 AND plant_year > 0"),
+        ("Qual è la specie più comune?", "ORDER BY count DESC LIMIT 1"),
+        ("Alberi con circonferenza > 100 cm", "WHERE trunk_circumference > 100"),
+        ("Qual è l'albero più vecchio?", "ORDER BY plant_year ASC LIMIT 1"),
+        ("Mostra i 10 alberi più vecchi", "ORDER BY plant_year ASC LIMIT 10"),
+    ],
+)
+def test_template_questions_skip_llm(question: str, expected: str) -> None:
+    llm = FakeLLM(COUNT_SQL)
+    tool = _tool(llm)
+
+    sql = tool._translate_to_sql(question, "schema")
+
+    assert expected in sql
+    assert llm.calls == 0
+
+
+def test_more_specific_questions_fall_through_to_llm() -> None:
+    llm = FakeLLM(COUNT_SQL)
+    tool = _tool(llm)
+
+    tool._translate_to_sql("Quanti alberi di Acer nel distretto 19?", "schema")
+
+    assert llm.calls == 1
+
+
+def test_question_is_sent_after_a_static_system_prompt() -> None:
+    llm = FakeLLM(COUNT_SQL)
+    tool = _tool(llm)
+
+    tool._translate_to_sql("Quanti alberi di Acer nel distretto 19?", "schema A")
+    first_system = llm.last_prompt[0].content
+    tool._translate_to_sql("Mostra i tigli del distretto 3", "schema A")
+
+    assert llm.last_prompt[0].content == first_system
+    assert "distretto 3" not in first_system
+    assert llm.last_prompt[1].content == "Mostra i tigli del distretto 3"
+
+
+@pytest.mark.parametrize(
+    "sql, capped",
+    [
+        ("SELECT * FROM baumkatogd;", True),
+        ("select objectid from baumkatogd where district = 1", True),
+        ("SELECT * FROM baumkatogd LIMIT 10", False),
+        ("SELECT COUNT(*) FROM baumkatogd", False),
+        ("SELECT AVG(tree_height), MAX(tree_height) FROM baumkatogd WHERE district = 3", False),
+        ("SELECT genus_species, COUNT(*) FROM baumkatogd GROUP BY genus_species", True),
+        ("SELECT * FROM (SELECT objectid FROM baumkatogd LIMIT 5) JOIN baumkatogd USING (objectid)", True),
+        ("SELECT * FROM baumkatogd WHERE object_street = 'limit 5'", True),
+        ("WITH t AS (SELECT objectid FROM baumkatogd) SELECT * FROM t", True),
+        ("WITH t AS (SELECT COUNT(*) AS n FROM baumkatogd) SELECT n FROM t", False),
+        ("PRAGMA table_info(baumkatogd)", False),
+    ],
+)
+def test_unbounded_selects_get_a_hard_limit(sql: str, capped: bool) -> None:
+    from streamlit_app.tools.dataset_tool import HARD_CAP, _cap_sql
+
+    assert _cap_sql(sql).endswith(f"LIMIT {HARD_CAP}") is capped
+
+
+def test_with_queries_are_wrapped_and_still_run() -> None:
+    import sqlite3
+
+    from streamlit_app.tools.dataset_tool import _cap_sql
+
+    capped = _cap_sql("WITH t(n) AS (VALUES (1), (2), (3)) SELECT n FROM t", cap=2)
+
+    assert capped == "SELECT * FROM (WITH t(n) AS (VALUES (1), (2), (3)) SELECT n FROM t) LIMIT 2"
+    assert sqlite3.connect(":memory:").execute(capped).fetchall() == [(1,), (2,)]
+
+
+def test_large_results_are_fetched_up_to_the_hard_cap(tmp_path: Path) -> None:
+    import sqlite3
+
+    from streamlit_app.tools.dataset_tool import HARD_CAP
+
+    db_path = tmp_path / "trees.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE baumkatogd (objectid INTEGER, genus_species TEXT)")
+    conn.executemany("INSERT INTO baumkatogd VALUES (?, ?)", [(i, "Acer") for i in range(5000)])
+    conn.commit()
+    conn.close()
+    tool = DatasetQueryTool(db_path=db_path, llm=FakeLLM("SELECT objectid, genus_species FROM baumkatogd"))
+    object.__setattr__(tool, "_embeddings", KeywordEmbeddings())
+
+    result = tool._run("Elenca gli aceri")
+
+    assert result["sql_executed"].endswith(f"LIMIT {HARD_CAP}")
+    assert result["total_rows_found"] == HARD_CAP
+    assert result["row_count"] == 50
+
+
+def test_prompt_uses_generated_dbh_column_when_present() -> None:
+    from streamlit_app.tools.dataset_tool import _static_prompt
+
+    with_column = _static_prompt(
+        "CREATE TABLE baumkatogd (trunk_circumference INTEGER, dbh_cm REAL GENERATED ALWAYS AS "
+        "(trunk_circumference / 3.141592653589793) VIRTUAL)",
+        2025,
+    )
+    without_column = _static_prompt("CREATE TABLE baumkatogd (trunk_circumference INTEGER)", 2025)
+
+    assert "DBH (diameter, cm) = dbh_cm" in with_column
+    assert "AVG(dbh_cm)" in with_column
+    assert "trunk_circumference / 3.14159" in without_column
+    assert "3.141592653589793" not in without_column
+
+
+def test_row_embeddings_are_requested_truncated(monkeypatch: pytest.MonkeyPatch) -> None:
+    from streamlit_app.tools.dataset_tool import EMBEDDING_DIMENSIONS
+
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    tool = DatasetQueryTool(db_path=DB_PATH, llm=FakeLLM(COUNT_SQL))
+
+    embeddings = tool._init_embeddings()
+
+    assert embeddings.dimensions == EMBEDDING_DIMENSIONS
+    assert tool._init_embeddings() is embeddings
+
+
+def test_top_k_indices_match_a_full_sort() -> None:
+    import numpy as np
+
+    from streamlit_app.tools.dataset_tool import _top_k_indices
+
+    scores = np.random.default_rng(0).random(500).astype(np.float32)
+
+    assert list(_top_k_indices(scores, 50)) == list(np.argsort(-scores)[:50])
+    assert list(_top_k_indices(scores[:3], 50)) == list(np.argsort(-scores[:3]))
+    assert len(_top_k_indices(scores[:0], 5)) == 0
+
+
+def test_async_run_awaits_llm_and_fills_caches() -> None:
+    import asyncio
+
+    if not DB_PATH.exists():
+        pytest.skip(f"Database not found at {DB_PATH}")
+    llm = FakeLLM(COUNT_SQL)
+    tool = _tool(llm, KeywordEmbeddings())
+    question = "Quanti alberi di Acer nel distretto 19?"
+
+    result = asyncio.run(tool.ainvoke({"natural_query": question}))
+
+    assert result["sql_executed"] == COUNT_SQL
+    assert result["natural_query"] == question
+    assert isinstance(result["result"], int)
+    assert tool._translate_to_sql(question, "schema") == COUNT_SQL
+    assert llm.calls == 1
+
+
+@pytest.mark.parametrize(
+    "fast_sql, strong_calls",
+    [
+        (COUNT_SQL, 0),
+        ("SELECT COUNT(*) FROM baumkatogd WHERE distretto = 19", 1),
+        ("DELETE FROM baumkatogd", 1),
+    ],
+)
+def test_fast_model_is_tried_first_and_escalates_on_invalid_sql(fast_sql: str, strong_calls: int) -> None:
+    if not DB_PATH.exists():
+        pytest.skip(f"Database not found at {DB_PATH}")
+    fast_llm, strong_llm = FakeLLM(fast_sql), FakeLLM(COUNT_SQL)
+    tool = DatasetQueryTool(db_path=DB_PATH, llm=strong_llm, fast_llm=fast_llm)
+
+    sql = tool._translate_to_sql("Quanti alberi di Acer nel distretto 19?", "schema")
+
+    assert sql == COUNT_SQL
+    assert fast_llm.calls == 1
+    assert strong_llm.calls == strong_calls
+
+
+def test_invalid_llm_sql_is_not_cached() -> None:
+    import asyncio
+
+    if not DB_PATH.exists():
+        pytest.skip(f"Database not found at {DB_PATH}")
+    llm = FakeLLM("SELECT COUNT(*) FROM baumkatogd WHERE distretto = 19")
+    embeddings = KeywordEmbeddings()
+    tool = _tool(llm, embeddings)
+    question = "Quanti alberi di Acer nel distretto 19?"
+
+    tool._translate_to_sql(question, "schema")
+    result = asyncio.run(tool.ainvoke({"natural_query": question}))
+    tool._translate_to_sql("alberi acer distretto 19", "schema")
+
+    assert "error" in result
+    assert llm.calls == 3
+    assert tool._semantic_cache._matrix is None
+
+
+@pytest.mark.parametrize(
+    "answer",
+    [
+        COUNT_SQL,
+        f"```sql\n{COUNT_SQL}\n```",
+        f"```\n{COUNT_SQL}\n```\n",
+        f"```SQL {COUNT_SQL}```",
+    ],
+)
+def test_code_fences_are_stripped_from_llm_sql(answer: str) -> None:
+    from streamlit_app.tools.dataset_tool import _sql_from_response
+
+    assert _sql_from_response(answer) == COUNT_SQL
+
+
+def test_repeated_sql_is_served_from_result_cache(tmp_path: Path) -> None:
+    import sqlite3
+
+    db_path = tmp_path / "trees.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE baumkatogd (objectid INTEGER, district INTEGER)")
+    conn.executemany("INSERT INTO baumkatogd VALUES (?, ?)", [(i, i % 3) for i in range(30)])
+    conn.commit()
+    sql = "SELECT district, COUNT(*) AS n FROM baumkatogd GROUP BY district"
+    tool = DatasetQueryTool(db_path=db_path, llm=FakeLLM(sql))
+
+    conn.close()
+
+    first = tool._execute_sql(sql)
+
+    class _NoPool:
+        def connection(self) -> Any:
+            raise AssertionError("cached SQL must not reach the database")
+
+    object.__setattr__(tool, "_pool", _NoPool())
+    second = tool._execute_sql(sql)
+
+    assert second == first
+    assert second["row_count"] == 3
+
+
+def test_semantic_cache_entries_survive_a_restart(tmp_path: Path) -> None:
+    import sqlite3
+
+    store = tmp_path / "nl2sql_cache.db"
+    cache = SemanticSQLCache(KeywordEmbeddings(), store_path=store)
+    _, vector = cache.lookup("alberi nel distretto 19")
+    cache.add("alberi nel distretto 19", vector, COUNT_SQL)
+
+    reloaded = SemanticSQLCache(KeywordEmbeddings(), store_path=store)
+
+    assert reloaded.lookup("Quanti alberi nel distretto 19?")[0] == COUNT_SQL
+    conn = sqlite3.connect(store)
+    assert conn.execute("SELECT question FROM nl2sql_cache").fetchall() == [("alberi nel distretto 19",)]
+    conn.close()
+
+
+@pytest.mark.parametrize("year, prompt_hash", [(2000, "v1"), (None, "v2")])
+def test_stored_entries_from_another_year_or_prompt_are_ignored(
+    tmp_path: Path, year: int | None, prompt_hash: str
+) -> None:
+    store = tmp_path / "nl2sql_cache.db"
+    cache = SemanticSQLCache(KeywordEmbeddings(), store_path=store, prompt_hash="v1")
+    _, vector = cache.lookup("alberi nel distretto 19")
+    cache.add("alberi nel distretto 19", vector, COUNT_SQL)
+
+    reloaded = SemanticSQLCache(
+        KeywordEmbeddings(), store_path=store, current_year=year, prompt_hash=prompt_hash
+    )
+
+    assert reloaded.lookup("Quanti alberi nel distretto 19?")[0] is None
+
+
+def test_unversioned_store_is_discarded(tmp_path: Path) -> None:
+    import sqlite3
+
+    store = tmp_path / "nl2sql_cache.db"
+    conn = sqlite3.connect(store)
+    conn.execute(
+        "CREATE TABLE nl2sql_cache (question TEXT PRIMARY KEY, embedding BLOB NOT NULL, "
+        "sql TEXT NOT NULL, created_at TEXT NOT NULL)"
+    )
+    conn.execute("INSERT INTO nl2sql_cache VALUES ('alberi', x'00', 'SELECT 1', '2024-01-01')")
+    conn.commit()
+    conn.close()
+
+    cache = SemanticSQLCache(KeywordEmbeddings(), store_path=store)
+
+    assert cache.lookup("alberi")[0] is None
+
+
+def test_semantic_cache_hit_does_not_write_to_the_store(tmp_path: Path) -> None:
+    cache = SemanticSQLCache(KeywordEmbeddings(), store_path=tmp_path / "nl2sql_cache.db")
+    _, vector = cache.lookup("alberi nel distretto 19")
+    cache.add("alberi nel distretto 19", vector, COUNT_SQL)
+
+    def _no_write(statement: str, params: tuple = ()) -> None:
+        raise AssertionError(f"lookup wrote to the store: {statement}")
+
+    cache._write_store = _no_write
+
+    assert cache.lookup("Quanti alberi nel distretto 19?")[0] == COUNT_SQL
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "DELETE FROM baumkatogd",
+        "SELECT 1; DROP TABLE baumkatogd",
+        "ATTACH DATABASE 'other.db' AS other",
+        "PRAGMA table_info(baumkatogd)",
+        "WITH t AS (SELECT 1) UPDATE baumkatogd SET district = 0",
+    ],
+)
+def test_non_select_sql_is_rejected_before_execution(sql: str) -> None:
+    tool = _tool(FakeLLM(sql))
+
+    class _NoPool:
+        def connection(self) -> Any:
+            raise AssertionError("rejected SQL must not reach the database")
+
+    object.__setattr__(tool, "_pool", _NoPool())
+
+    result = tool._execute_sql(sql)
+
+    assert result["error"] == "Only single read-only SELECT queries are allowed"
+    assert result["sql_attempted"] == sql
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT REPLACE(genus_species, 'x', 'y') FROM baumkatogd",
+        "SELECT objectid FROM baumkatogd WHERE object_street LIKE '%Create%'",
+        "SELECT objectid FROM baumkatogd WHERE object_street = 'a;b'",
+    ],
+)
+def test_keywords_inside_literals_and_function_names_are_allowed(sql: str) -> None:
+    from streamlit_app.tools.sqlite_connection import is_read_query
+
+    assert is_read_query(sql) is True
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "ATTACH DATABASE ':memory:' AS other",
+        "PRAGMA table_info(baumkatogd)",
+        "DELETE FROM baumkatogd",
+    ],
+)
+def test_pooled_connections_only_authorize_selects(tmp_path: Path, sql: str) -> None:
+    import sqlite3
+
+    from streamlit_app.tools.sqlite_connection import ReadOnlyConnectionPool
+
+    db_path = tmp_path / "trees.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE baumkatogd (objectid INTEGER, genus_species TEXT)")
+    conn.execute("INSERT INTO baumkatogd VALUES (1, 'Acer x')")
+    conn.commit()
+    conn.close()
+    pool = ReadOnlyConnectionPool(db_path, size=1)
+
+    with pool.connection() as pooled:
+        assert pooled.execute("SELECT REPLACE(genus_species, 'x', 'y') FROM baumkatogd").fetchall() == [("Acer y",)]
+        with pytest.raises(sqlite3.DatabaseError, match="not authorized"):
+            pooled.execute(sql)
+
+
+def test_result_cache_key_ignores_layout_but_not_literals() -> None:
+    from streamlit_app.tools.dataset_tool import _sql_cache_key
+
+    assert _sql_cache_key("SELECT  district\n FROM baumkatogd ;") == _sql_cache_key(
+        "SELECT district FROM baumkatogd"
+    )
+    assert _sql_cache_key("SELECT 1 WHERE x = 'a  b'") != _sql_cache_key("SELECT 1 WHERE x = 'a b'")
+
+
+def test_summary_tables_are_offered_to_the_llm_when_present(tmp_path: Path) -> None:
+    import sqlite3
+
+    from streamlit_app.tools.dataset_tool import _static_prompt
+
+    db_path = tmp_path / "trees.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE baumkatogd (district INTEGER, genus_species TEXT)")
+    conn.execute("CREATE TABLE baumkatogd_by_district (district INTEGER, tree_count INTEGER)")
+    conn.execute("CREATE TABLE baumkatogd_by_species (genus_species TEXT, tree_count INTEGER)")
+    conn.close()
+    tool = DatasetQueryTool(db_path=db_path, llm=FakeLLM(COUNT_SQL))
+
+    prompt = _static_prompt(tool._get_schema_info(), 2025, tool._has_fts_index(), tool._has_summary_tables())
+
+    assert tool._has_summary_tables() is True
+    assert tool._has_fts_index() is False
+    assert "FROM baumkatogd_by_district" in prompt
+    assert "2025 - avg_plant_year" in prompt
+    assert "FROM baumkatogd_by_district" not in _static_prompt(tool._get_schema_info(), 2025)
+
+
+def test_outdated_dataset_is_reported_once(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    import sqlite3
+
+    from streamlit_app.tools.sqlite_connection import connect_readonly, missing_schema_objects
+
+    db_path = tmp_path / "trees.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE baumkatogd (district INTEGER, trunk_circumference INTEGER)")
+    conn.execute("CREATE TABLE baumkatogd_by_district (district INTEGER, tree_count INTEGER)")
+    conn.close()
+
+    first = connect_readonly(db_path)
+    connect_readonly(db_path).close()
+
+    assert "dbh_cm" in missing_schema_objects(first)
+    assert "baumkatogd_by_district" not in missing_schema_objects(first)
+    assert capsys.readouterr().out.count("init_db.py") == 1
+    first.close()
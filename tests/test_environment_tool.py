@@ -0,0 +1,75 @@
+import pytest
+
+from streamlit_app.tools.environment_tool import EnvironmentEstimationTool, _cached_results
+
+
+def test_tool_returns_estimates_for_a_tree() -> None:
+    result = EnvironmentEstimationTool()._run(diameter_cm=30.0, height_m=12.0)
+
+    assert result["results"]["volume_dm3"] == pytest.approx(0.039 * 30.0**2 * 12.0, abs=1e-6)
+    assert result["results"]["carbon_stock_kg"] == pytest.approx(result["results"]["biomass_kg"] * 0.47, abs=1e-5)
+
+
+def test_tools_share_service_and_cache_results_on_rounded_inputs() -> None:
+    _cached_results.cache_clear()
+    first_tool, second_tool = EnvironmentEstimationTool(), EnvironmentEstimationTool()
+
+    first = first_tool._run(diameter_cm=25.0)
+    first["results"]["volume_dm3"] = -1.0  # callers get a copy, not the cached dict
+    second = second_tool._run(diameter_cm=25.00001)
+
+    assert first_tool._service is second_tool._service
+    assert second["results"]["volume_dm3"] > 0
+    assert _cached_results.cache_info().hits == 1
+    # Cache hits are stamped with their own call time, not the first call's
+    assert second["inputs"]["meta"]["timestamp"] > first["inputs"]["meta"]["timestamp"]
+
+
+def test_cache_hits_are_still_logged_with_their_own_log_id(monkeypatch: pytest.MonkeyPatch) -> None:
+    from streamlit_app.tools import environment_tool
+
+    class CountingLogger:
+        def __init__(self) -> None:
+            self.payloads = []
+
+        def log(self, payload: dict) -> tuple:
+            self.payloads.append(payload)
+            return True, f"log-{len(self.payloads)}"
+
+    logger = CountingLogger()
+    monkeypatch.setattr(environment_tool._DEFAULT_SERVICE, "_logger", logger)
+    _cached_results.cache_clear()
+    tool = EnvironmentEstimationTool()
+
+    first = tool._run(diameter_cm=18.0, height_m=9.0)
+    second = tool._run(diameter_cm=18.0, height_m=9.0)
+
+    assert _cached_results.cache_info().hits == 1
+    assert len(logger.payloads) == 2
+    assert [first["logging"]["log_id"], second["logging"]["log_id"]] == ["log-1", "log-2"]
+    assert logger.payloads[1]["outputs"]["volume_dm3"] == second["results"]["volume_dm3"]
+
+
+def test_batch_matches_single_tree_estimates() -> None:
+    from streamlit_app.tools.environment_tool import EnvironmentBatchEstimationTool
+
+    diameters = [12.0, 30.0, 55.5]
+    heights = [6.0, None, 22.0]
+
+    result = EnvironmentBatchEstimationTool()._run(diameter_cm=diameters, height_m=heights)
+
+    singles = [EnvironmentEstimationTool()._run(diameter_cm=d, height_m=h)["results"] for d, h in zip(diameters, heights)]
+    assert result["tree_count"] == 3
+    assert result["volume_dm3"] == pytest.approx(sum(s["volume_dm3"] for s in singles), abs=1e-4)
+    assert result["carbon_stock_kg_per_tree"] == pytest.approx([s["carbon_stock_kg"] for s in singles], abs=1e-5)
+
+
+def test_compute_batch_rejects_mismatched_or_non_positive_inputs() -> None:
+    from app.services.environment_service import EnvironmentalEstimationService
+
+    service = EnvironmentalEstimationService()
+
+    with pytest.raises(ValueError):
+        service.compute_batch([10.0, 20.0], [5.0])
+    with pytest.raises(ValueError):
+        service.compute_batch([10.0, 0.0])
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import json
+
+from streamlit_app.ui import ChatUI
+
+
+def _extract(content: str):
+    return ChatUI(service=None)._extract_chart_from_response(content)
+
+
+def test_chart_between_markers_is_split_from_text() -> None:
+    chart = {"success": True, "chart": {"data": []}, "chart_type": "bar"}
+    content = f"Ecco il grafico.\n\nCHART_DATA_START\n{json.dumps(chart)}\nCHART_DATA_END\nFine."
+
+    text, chart_data = _extract(content)
+
+    assert text == "Ecco il grafico. Fine."
+    assert chart_data == chart
+
+
+def test_markers_at_start_of_response_are_recognized() -> None:
+    chart = {"success": True, "chart": {"data": []}}
+
+    text, chart_data = _extract(f"CHART_DATA_START{json.dumps(chart)}CHART_DATA_END")
+
+    assert text == ""
+    assert chart_data == chart
+
+
+def test_plain_text_is_returned_unchanged() -> None:
+    assert _extract("Nel distretto 19 ci sono 1200 alberi.") == ("Nel distretto 19 ci sono 1200 alberi.", None)
+
+
+def test_parsed_chart_is_not_shared_between_calls() -> None:
+    content = 'Grafico CHART_DATA_START{"success": true, "chart": {"data": []}}CHART_DATA_END'
+
+    first = _extract(content)[1]
+    first["chart"]["data"].append({"type": "bar"})
+
+    assert _extract(content)[1] == {"success": True, "chart": {"data": []}}